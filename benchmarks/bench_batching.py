@@ -0,0 +1,37 @@
+# Counts add_playlist_items requests made by copyFavSongs_toYT_playlist for different BATCH_SIZE values.
+# Usage: python benchmarks/bench_batching.py [tracks] [rejected_tracks]
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import musicMigrator
+from fake_ytmusic import FakeYTMusic
+
+def main():
+    tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rejected = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    library = [musicMigrator.Track(f"Song {i}", f"Artist {i % 50}", f"sp{i}") for i in range(tracks)]
+    rejected_ids = {f"vid_sp{i}" for i in range(0, tracks, max(tracks // max(rejected, 1), 1))[:rejected]}
+    musicMigrator.MISMATCH_DIR = tempfile.mkdtemp()
+    musicMigrator.beep = lambda: None
+    print(f"{tracks} tracks, {len(rejected_ids)} rejected by the server")
+    for batch_size in (1, 10, 50, 100):
+        fake = FakeYTMusic(library, latency=0.005, rejected_ids=rejected_ids)
+        musicMigrator.yt = fake
+        musicMigrator.CONFIG_DIR = tempfile.mkdtemp()  # Empty match cache for every run
+        musicMigrator.match_cache = None
+        musicMigrator.search_cache = None
+        musicMigrator.BATCH_SIZE = batch_size
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            musicMigrator.copyFavSongs_toYT_playlist(library)
+        elapsed = time.perf_counter() - start
+        added = len(next(iter(fake.playlists.values()))["videoIds"])
+        print(f"batch={batch_size:>3}  add_playlist_items calls={fake.calls['add_playlist_items']:>4}  added={added}  {elapsed:5.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Shows how copyFavSongs_toYT_playlist throughput scales with MAX_WORKERS against a fake YTMusic.
+# Usage: python benchmarks/bench_concurrency.py [tracks] [latency_seconds] [max_rps]
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import musicMigrator
+from fake_ytmusic import FakeYTMusic
+
+def main():
+    tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    max_rps = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    library = [musicMigrator.Track(f"Song {i}", f"Artist {i % 50}", f"sp{i}") for i in range(tracks)]
+    musicMigrator.MISMATCH_DIR = tempfile.mkdtemp()
+    musicMigrator.beep = lambda: None
+    print(f"{tracks} tracks, {latency * 1000:.0f} ms latency, {max_rps:g} requests/s limit")
+    for workers in (1, 2, 4, 8, 16, 32):
+        fake = FakeYTMusic(library, latency=latency, max_rps=max_rps)
+        musicMigrator.yt = fake
+        musicMigrator.CONFIG_DIR = tempfile.mkdtemp()  # Empty match cache for every run
+        musicMigrator.match_cache = None
+        musicMigrator.search_cache = None
+        musicMigrator.MAX_WORKERS = workers
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            musicMigrator.copyFavSongs_toYT_playlist(library)
+        elapsed = time.perf_counter() - start
+        playlist = next(iter(fake.playlists.values()))["videoIds"]
+        in_order = playlist == [f"vid_{track.id}" for track in library]
+        print(f"workers={workers:>2}  {elapsed:6.2f}s  {tracks / elapsed:7.1f} tracks/s  order preserved: {in_order}")
+
+if __name__ == "__main__":
+    main()
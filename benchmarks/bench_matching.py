@@ -0,0 +1,50 @@
+# Compares the speed and accuracy of the MATCH_ENGINES of musicMigrator on labeled search results.
+# Every fixture has a Spotify song, the YTmusic search results and the videoId that should be chosen (null = no match).
+# Usage: python benchmarks/bench_matching.py [repetitions]
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import musicMigrator
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "match_fixtures.json")
+
+def choose(fixture):
+    song = musicMigrator.Track(fixture["track"]["name"], fixture["track"]["artist"], None)
+    try:
+        candidates = [musicMigrator.MatchCandidate.from_result(result) for result in fixture["results"]]
+        return musicMigrator.find_best_match(song, candidates).video_id
+    except ValueError:
+        return None
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+    timings = {}
+    for engine in musicMigrator.MATCH_ENGINES:
+        musicMigrator.MATCH_ENGINE = engine
+        correct = sum(choose(fixture) == fixture["expected"] for fixture in fixtures)
+        for cold in (True, False):
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                if cold:  # Every repetition pays the normalization cost again
+                    musicMigrator.normalize_text.cache_clear()
+                    musicMigrator.ngrams.cache_clear()
+                for fixture in fixtures:
+                    choose(fixture)
+            timings[engine, cold] = (time.perf_counter() - start) / (repetitions * len(fixtures))
+        print(f"{engine:<9} accuracy {correct}/{len(fixtures)} ({correct / len(fixtures):.0%})  "
+              f"{timings[engine, True] * 1e6:7.1f} us per song (cold), {timings[engine, False] * 1e6:7.1f} us (warm caches)")
+        for fixture in fixtures:
+            chosen = choose(fixture)
+            if chosen != fixture["expected"]:
+                print(f"    wrong: {fixture['track']['name']} - {fixture['track']['artist']}: chose {chosen}, expected {fixture['expected']}")
+    if "sequence" in musicMigrator.MATCH_ENGINES and "fast" in musicMigrator.MATCH_ENGINES:
+        print(f"fast engine speedup: {timings['sequence', True] / timings['fast', True]:.1f}x cold, "
+              f"{timings['sequence', False] / timings['fast', False]:.1f}x warm")
+
+if __name__ == "__main__":
+    main()
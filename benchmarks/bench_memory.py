@@ -0,0 +1,68 @@
+# Compares the memory kept by a synthetic library with its search results, stored as the original tuples and raw
+# YTmusic result dicts ("raw") or as musicMigrator.Track and MatchCandidate objects ("compact").
+# Every mode runs in its own process so peak RSS can be compared.
+# Usage: python benchmarks/bench_memory.py [tracks] [results_per_track]
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def spotify_item(i):
+    artist = f"Artist {i % 2000}"
+    return json.dumps({"track": {"id": f"{i:022d}", "name": f"Song number {i}", "duration_ms": 180000 + i % 60000,
+                                 "external_ids": {"isrc": f"USRC1{i:07d}"}, "album": {"name": f"Album {i % 5000}"},
+                                 "artists": [{"name": artist}, {"name": f"Artist {(i * 7) % 2000}"}]}})
+
+def yt_results(i, count):
+    # Shaped like the results of ytmusicapi's search(filter="songs")
+    return json.dumps([{"category": "Songs", "resultType": "song", "title": f"Song number {i}" + (" (Live)" if n else ""),
+                        "album": {"name": f"Album {i % 5000}", "id": f"MPREb_{i:011d}"}, "inLibrary": False,
+                        "feedbackTokens": {"add": None, "remove": None}, "videoId": f"v{i:09d}{n}", "videoType": "MUSIC_VIDEO_TYPE_ATV",
+                        "duration": "3:00", "year": None, "artists": [{"name": f"Artist {(i + n) % 2000}", "id": f"UC{(i + n) % 2000:022d}"}],
+                        "duration_seconds": 180 + n, "isExplicit": False,
+                        "thumbnails": [{"url": f"https://lh3.googleusercontent.com/{i:040d}{n}=w{size}-h{size}-l90-rj", "width": size, "height": size}
+                                       for size in (60, 120)]}
+                       for n in range(count)])
+
+def measure(mode, tracks, results_per_track):
+    import musicMigrator
+    tracemalloc.start()
+    library = []
+    results = {}
+    for i in range(tracks):
+        item = json.loads(spotify_item(i))["track"]
+        if mode == "raw":
+            library.append((item["name"], item["artists"][0]["name"], item["id"]))
+            results[item["id"]] = json.loads(yt_results(i, results_per_track))
+        else:
+            library.append(musicMigrator.track_from_spotify(item))
+            results[item["id"]] = [musicMigrator.MatchCandidate.from_result(r) for r in json.loads(yt_results(i, results_per_track))]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = None
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    except ImportError:  # Not available on Windows
+        pass
+    print(json.dumps({"mode": mode, "retained_mb": current / 2 ** 20, "traced_peak_mb": peak / 2 ** 20, "peak_rss_mb": rss}))
+
+def main():
+    tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    results_per_track = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{tracks} tracks, {results_per_track} search results each")
+    for mode in ("raw", "compact"):
+        output = subprocess.run([sys.executable, __file__, "--measure", mode, str(tracks), str(results_per_track)],
+                                capture_output=True, text=True, check=True).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        rss = f"{stats['peak_rss_mb']:7.1f} MB" if stats["peak_rss_mb"] is not None else "n/a"
+        print(f"{mode:<8} retained {stats['retained_mb']:7.1f} MB   traced peak {stats['traced_peak_mb']:7.1f} MB   peak RSS {rss}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main()
@@ -0,0 +1,78 @@
+# Runs run_scheduler with 1, 2, 4, ... tenants, each transferring a playlist with the real migrate job
+# (build_job_command, run by fake_job.py with fake clients). Every tenant's fake services accept --quota requests
+# per second, like the quota of a real account, so aggregate tracks/s should grow with the tenants until the shared
+# --workers are spread too thin. With --same-library every tenant has the same songs, so the tenants share
+# the matches saved in the match cache.
+# Usage: python benchmarks/bench_scheduler.py [--tenants 1 2 4 8] [--size 500] [--quota 100] [--workers 32] [--same-library]
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import musicMigrator
+
+FAKE_JOB = os.path.join(BENCH_DIR, "fake_job.py")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Throughput of the multi-tenant scheduler")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 2, 4, 8], help="tenants migrated together")
+    parser.add_argument("--size", type=int, default=500, help="tracks in every tenant's playlist")
+    parser.add_argument("--quota", type=float, default=100, help="requests per second accepted by each tenant's fake services")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every fake API request")
+    parser.add_argument("--workers", type=int, default=32, help="SCHEDULER_WORKERS, split between the running tenants")
+    parser.add_argument("--same-library", action="store_true", help="every tenant has the same songs")
+    return parser.parse_args(argv)
+
+def job_command(tenant, args, workers):
+    command = musicMigrator.build_job_command(tenant, args, workers)
+    command[1] = FAKE_JOB  # The same command line, with the fake clients
+    return command
+
+def run(args, tenants):
+    musicMigrator.TENANTS_DIR = tempfile.mkdtemp()
+    queue = musicMigrator.JobQueue(os.path.join(musicMigrator.TENANTS_DIR, musicMigrator.SCHEDULER_DB))
+    for number in range(tenants):
+        tenant_dir = musicMigrator.get_tenant_dir(f"tenant{number}")
+        for name, credentials in (("spotify_auth.json", {"client_id": "id", "client_secret": "secret"}),
+                                  ("ytmusic_auth.json", {"installed": {"client_id": "id", "client_secret": "secret"}}),
+                                  ("settings.json", {"yt_rate_limit": args.quota, "spotify_rate_limit": args.quota})):
+            with open(os.path.join(tenant_dir, name), "w") as file:
+                json.dump(credentials, file)
+        queue.add(f"tenant{number}", ["--playlists", "Benchmark", "--yes"])
+    start = time.perf_counter()
+    failed = musicMigrator.run_scheduler(queue, tenants, args.workers, job_command, poll_interval=0.05)
+    elapsed = time.perf_counter() - start
+    queue.close()
+    if failed:  # Not worth timing, show why instead
+        for path in sorted(glob.glob(os.path.join(musicMigrator.TENANTS_DIR, "*", "job_*.log"))):
+            with open(path, "r", encoding="utf-8") as file:
+                print(f"{path}:\n{file.read()}")
+            break
+        sys.exit(f"{failed} of {tenants} jobs failed")
+    added = slowest = 0
+    for path in glob.glob(os.path.join(musicMigrator.TENANTS_DIR, "*", musicMigrator.MISMATCH_DIR, "run_report_*.json")):
+        with open(path, "r", encoding="utf-8") as file:
+            for transfer in json.load(file)["transfers"]:
+                added += transfer["added"]
+                slowest = max(slowest, transfer["seconds"])
+    return failed, elapsed, slowest, added
+
+def main():
+    args = parse_args(sys.argv[1:])
+    musicMigrator.JOB_ATTEMPTS = 1  # A job failing here is a bug of the benchmark or of the migrator, retrying won't help
+    musicMigrator.JOB_BACKOFF = 0
+    os.environ.update(FAKE_SIZE=str(args.size), FAKE_QUOTA=str(args.quota), FAKE_LATENCY=str(args.latency), FAKE_SAME_LIBRARY="1" if args.same_library else "0")
+    print(f"{args.size} tracks per tenant, quota {args.quota:g} requests/s per tenant, latency {args.latency * 1000:g} ms, {args.workers} workers"
+          f"{', same library' if args.same_library else ''}")
+    print(f"{'tenants':>8}{'workers each':>14}{'seconds':>10}{'slowest transfer':>18}{'added':>8}{'tracks/s':>11}{'failed':>8}")
+    for tenants in args.tenants:
+        failed, elapsed, slowest, added = run(args, tenants)
+        print(f"{tenants:>8}{max(1, args.workers // tenants):>14}{elapsed:>10.2f}{slowest:>18.2f}{added:>8}{tenants * args.size / elapsed:>11.0f}{failed:>8}")
+
+if __name__ == "__main__":
+    main()
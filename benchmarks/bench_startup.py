@@ -0,0 +1,117 @@
+# Measures time-to-menu (starting a new interpreter and importing musicMigrator) and time-to-first-search (connecting both
+# accounts and searching one song, against fake clients), and exits with an error if either goes over its budget.
+# It also checks that the notification beep works with a fake winsound module.
+# Usage: python benchmarks/bench_startup.py [auth_latency_seconds]
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from fake_backend import install_fake_clients
+from fake_ytmusic import FakeYTMusic
+
+MENU_BUDGET = 0.5  # Seconds
+FIRST_SEARCH_BUDGET = 1.0  # Seconds, with the default auth latency
+
+def time_import(code):
+    # Best of 5 runs of code in a new interpreter
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(BENCH_DIR), capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def install_login_clients(auth_latency, library):
+    # The API libraries are replaced by clients that only wait auth_latency when checking the account
+    class FakeSpotify:
+        def __init__(self, *args, **kwargs):
+            pass
+        def current_user(self):
+            time.sleep(auth_latency)
+            return {"id": "fake", "display_name": "Fake user"}
+    class FakeYTClient(FakeYTMusic):
+        def __init__(self, *args, **kwargs):
+            super().__init__(library, latency=0.05)
+        def get_account_info(self):
+            time.sleep(auth_latency)
+            return super().get_account_info()
+    install_fake_clients(FakeSpotify, FakeYTClient)
+
+def check_beep(musicMigrator):
+    # The real beep, with a winsound module that only records its calls (the benchmarks replace beep otherwise)
+    calls = []
+    winsound = types.ModuleType("winsound")
+    winsound.Beep = lambda frequency, duration: calls.append((frequency, duration))
+    saved = sys.modules.get("winsound")
+    sys.modules["winsound"] = winsound
+    try:
+        musicMigrator.beep()
+    finally:
+        if saved is None:
+            del sys.modules["winsound"]
+        else:
+            sys.modules["winsound"] = saved
+    return calls == [(musicMigrator.freq, musicMigrator.tempo)]
+
+def time_first_search(musicMigrator, library, parallel):
+    musicMigrator.CONFIG_DIR = tempfile.mkdtemp()
+    musicMigrator.MISMATCH_DIR = tempfile.mkdtemp()  # The run report is saved there
+    with open(os.path.join(musicMigrator.CONFIG_DIR, "spotify_auth.json"), "w") as file:
+        json.dump({"client_id": "id", "client_secret": "secret"}, file)
+    with open(os.path.join(musicMigrator.CONFIG_DIR, "ytmusic_auth.json"), "w") as file:
+        json.dump({"installed": {"client_id": "id", "client_secret": "secret"}}, file)
+    musicMigrator.yt = musicMigrator.sp = None
+    musicMigrator.session_users.clear()
+    musicMigrator.match_cache = musicMigrator.search_cache = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if parallel:
+            connected = musicMigrator.connect_clients()
+        else:
+            musicMigrator.connectToSpotifyAPI()
+            musicMigrator.connectToYTmusicAPI()
+            connected = True
+        for _ in range(3):  # Later connection checks of the session are free
+            connected = connected and musicMigrator.isSpotifyAPI_connected() and musicMigrator.isYTmusicAPI_connected()
+        musicMigrator.search_and_match(library[0])
+        elapsed = time.perf_counter() - start
+        musicMigrator.close_session()
+    return elapsed, connected
+
+def main():
+    auth_latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    over_budget = False
+
+    baseline, _ = time_import("pass")
+    menu, result = time_import("import sys, musicMigrator; musicMigrator.build_parser(); print('spotipy' in sys.modules, 'ytmusicapi' in sys.modules)")
+    if result.returncode:
+        print(result.stderr)
+        sys.exit(1)
+    print(f"time-to-menu: {menu:.3f}s (interpreter alone {baseline:.3f}s), API libraries imported: {result.stdout.split()}")
+    libraries, result = time_import("import spotipy, ytmusicapi")
+    print(f"deferred until connecting: {libraries - baseline:.3f}s" if result.returncode == 0 else "spotipy/ytmusicapi not installed, their import time isn't measured")
+    over_budget |= menu > MENU_BUDGET
+
+    import musicMigrator
+    beeps = check_beep(musicMigrator)
+    print(f"beep at the end of a transfer: {'ok' if beeps else 'FAILED'}")
+    library = [musicMigrator.Track("Song", "Artist", "sp0")]
+    install_login_clients(auth_latency, library)
+    sequential, _ = time_first_search(musicMigrator, library, parallel=False)
+    parallel, connected = time_first_search(musicMigrator, library, parallel=True)
+    print(f"time-to-first-search with {auth_latency * 1000:.0f} ms per login: {sequential:.3f}s one client after the other, {parallel:.3f}s in parallel (connected: {connected})")
+    over_budget |= auth_latency <= 0.3 and parallel > FIRST_SEARCH_BUDGET
+
+    print(f"budgets: menu {MENU_BUDGET}s, first search {FIRST_SEARCH_BUDGET}s -> {'OVER BUDGET' if over_budget else 'ok'}")
+    sys.exit(1 if over_budget or not beeps else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Runs transferPlaylist, copyFavSongs_toYT_playlist and find_best_match against the fake YTMusic and Spotify clients on
+# generated libraries, and reports tracks/s, API calls per track and peak memory. Every run happens in its own process.
+# Usage: python benchmarks/bench_suite.py [--sizes 100 1000 10000] [--latency 0.01] [--error-rate 0.01] [--max-rps 500] [--throttle]
+#        [--isrc-miss-rate 0.2]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCENARIOS = ["transferPlaylist", "copyFavSongs_toYT_playlist", "find_best_match"]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of musicMigrator")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="library sizes (tracks)")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds added to every fake API request")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="fraction of requests failing with HTTP 503")
+    parser.add_argument("--max-rps", type=float, default=0, help="requests per second accepted by each fake service (0: no limit)")
+    parser.add_argument("--throttle", action="store_true", help="answer 429 above --max-rps instead of queueing the requests")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="fraction of songs that aren't on the fake YTmusic")
+    parser.add_argument("--hard-rate", type=float, default=0.05, help="fraction of songs only found by the fallback searches")
+    parser.add_argument("--isrc-miss-rate", type=float, default=0.2, help="fraction of songs with an ISRC that the fake YTmusic doesn't find by it")
+    parser.add_argument("--no-fallback", action="store_true", help="turn SEARCH_FALLBACK off")
+    parser.add_argument("--workers", type=int, default=8, help="MAX_WORKERS")
+    parser.add_argument("--measure", nargs=2, metavar=("SCENARIO", "SIZE"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows, tracemalloc was started with the run
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+def setup(args, library, playlists, favorites):
+    import musicMigrator
+    from fake_spotify import FakeSpotify
+    from fake_ytmusic import FakeYTMusic
+    musicMigrator.CONFIG_DIR = tempfile.mkdtemp()
+    musicMigrator.MISMATCH_DIR = tempfile.mkdtemp()
+    musicMigrator.beep = lambda: None
+    musicMigrator.MAX_WORKERS = args.workers
+    musicMigrator.SEARCH_FALLBACK = not args.no_fallback
+    musicMigrator.BACKOFF_BASE = 0.01
+    musicMigrator.BACKOFF_MAX = 1
+    rate = args.max_rps or 1e9  # The client side limiter only slows down when the fake server throttles
+    fakes = {"yt": FakeYTMusic(library, args.latency, args.max_rps or None, error_rate=args.error_rate, throttle=args.throttle,
+                                 missing_rate=args.missing_rate, hard_rate=args.hard_rate, isrc_miss_rate=args.isrc_miss_rate),
+             "sp": FakeSpotify(playlists, favorites, args.latency, args.max_rps or None, args.error_rate, args.throttle)}
+    musicMigrator.yt = musicMigrator.RateLimitedClient(fakes["yt"], "YTmusic", rate)
+    musicMigrator.sp = musicMigrator.RateLimitedClient(fakes["sp"], "Spotify", rate)
+    return musicMigrator, fakes
+
+def measure(args, scenario, size):
+    try:
+        import resource
+    except ImportError:  # No peak RSS on Windows, tracemalloc is used instead
+        import tracemalloc
+        tracemalloc.start()
+    from library import generate_library
+    library = generate_library(size)
+    musicMigrator, fakes = setup(args, library, {"Benchmark": library} if scenario == "transferPlaylist" else {}, library)
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        start = time.perf_counter()
+        if scenario == "transferPlaylist":
+            musicMigrator.transferPlaylist("sp_playlist_0", "Benchmark", "Spotify", "YTmusic", num_songs=size)
+        elif scenario == "copyFavSongs_toYT_playlist":
+            musicMigrator.copyFavSongs_toYT_playlist(musicMigrator.getSPFavoriteTracks(), num_songs=size)
+        else:
+            # Only the matching CPU: search results are prepared first, with the candidates of other songs mixed in
+            catalog = fakes["yt"]._catalog
+            candidates = [[musicMigrator.MatchCandidate.from_result(result) for result in catalog.get(f"{track.name} {track.artist}".lower(), [])] for track in library]
+            candidates = [results + [c for other in candidates[n + 1:n + 5] for c in other] for n, results in enumerate(candidates)]
+            start = time.perf_counter()
+            for track, results in zip(library, candidates):
+                try:
+                    musicMigrator.find_best_match(track, results)
+                except ValueError:
+                    pass
+        elapsed = time.perf_counter() - start
+        isrc = musicMigrator.get_isrc_gate().stats()
+        musicMigrator.close_session()
+    finally:
+        sys.stdout = stdout
+    calls = sum(fake.total_calls() for fake in fakes.values())
+    retries = musicMigrator.yt.retries + musicMigrator.sp.retries
+    added = sum(len(playlist["videoIds"]) for playlist in fakes["yt"].playlists.values())
+    print(json.dumps({"scenario": scenario, "size": size, "seconds": elapsed, "tracks_per_s": size / elapsed, "api_calls_per_track": calls / size,
+                      "retries": retries, "added": added, "peak_mb": peak_memory_mb(),
+                      "searches_per_track": fakes["yt"].calls.get("search", 0) / size, "isrc": isrc}))
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.measure:
+        measure(args, args.measure[0], int(args.measure[1]))
+        return
+    print(f"latency {args.latency * 1000:g} ms, error rate {args.error_rate:.1%}, {'max ' + format(args.max_rps, 'g') + ' requests/s' if args.max_rps else 'no rate limit'}"
+          f"{' (429 above it)' if args.throttle else ''}, {args.workers} workers")
+    print(f"{'scenario':<28}{'tracks':>8}{'seconds':>10}{'tracks/s':>11}{'calls/track':>13}{'searches/track':>16}{'retries':>9}{'added':>8}{'peak MB':>9}"
+          f"  ISRC searches (found, skipped)")
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            result = subprocess.run([sys.executable, __file__, *sys.argv[1:], "--measure", scenario, str(size)], capture_output=True, text=True)
+            if result.returncode:
+                print(f"{scenario:<28}{size:>8}  failed:\n{result.stderr}")
+                continue
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            isrc = r["isrc"]
+            print(f"{scenario:<28}{size:>8}{r['seconds']:>10.2f}{r['tracks_per_s']:>11.0f}{r['api_calls_per_track']:>13.3f}{r['searches_per_track']:>16.3f}"
+                  f"{r['retries']:>9}{r['added']:>8}{r['peak_mb']:>9.1f}  {isrc['tried']} ({isrc['hits']}, {isrc['skipped']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import random
+import threading
+import time
+
+class FakeService:
+    # Latency, rate limit and random server errors shared by the fake API clients
+    def __init__(self, latency=0.05, max_rps=None, error_rate=0.0, throttle=False):
+        self.latency = latency
+        self.max_rps = max_rps
+        self.error_rate = error_rate  # Fraction of requests failing with a retryable server error (503)
+        self.throttle = throttle  # Requests above max_rps fail with 429 instead of being queued
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _request(self, method):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            delay = 0.0
+            if self.max_rps:  # Requests above max_rps are queued (or rejected), like a throttling server
+                now = time.perf_counter()
+                if self.throttle and now < self._next_slot:
+                    raise self._error(429, retry_after=self._next_slot - now)
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + 1.0 / self.max_rps
+                delay = slot - now
+        time.sleep(delay + self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise self._error(503)
+
+    def _error(self, status, retry_after=None):
+        return Exception(f"Server returned HTTP {status}.")
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+def install_fake_clients(spotify_class, ytmusic_class):
+    # Replaces the spotipy and ytmusicapi modules, so musicMigrator's connectTo* functions build spotify_class and
+    # ytmusic_class (both called with the arguments of the real clients) without the real libraries or any network
+    import sys
+    import types
+    modules = {"spotipy": types.ModuleType("spotipy"), "spotipy.oauth2": types.ModuleType("spotipy.oauth2"),
+               "ytmusicapi": types.ModuleType("ytmusicapi"), "ytmusicapi.exceptions": types.ModuleType("ytmusicapi.exceptions")}
+    modules["spotipy"].Spotify = spotify_class
+    modules["spotipy"].oauth2 = modules["spotipy.oauth2"]
+    modules["spotipy.oauth2"].SpotifyOAuth = lambda **kwargs: None
+    modules["ytmusicapi"].YTMusic = ytmusic_class
+    modules["ytmusicapi"].OAuthCredentials = lambda **kwargs: None
+    modules["ytmusicapi.exceptions"].YTMusicServerError = type("YTMusicServerError", (Exception,), {})
+    sys.modules.update(modules)
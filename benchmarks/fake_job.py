@@ -0,0 +1,42 @@
+# Runs musicMigrator's command line with spotipy and ytmusicapi replaced by the fake clients, so bench_scheduler.py
+# can run the scheduler's real jobs offline. Every tenant (the name of its --config-dir) gets its own library and its own
+# fake services, limited to FAKE_QUOTA requests per second like the quota of a real account.
+# Settings come from the environment: FAKE_SIZE, FAKE_QUOTA, FAKE_LATENCY and FAKE_SAME_LIBRARY (every tenant has the same songs).
+import os
+import sys
+import zlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import musicMigrator
+from fake_backend import install_fake_clients
+from fake_spotify import FakeSpotify
+from fake_ytmusic import FakeYTMusic
+from library import generate_library
+
+def tenant_library(tenant, size, same_library):
+    if same_library:
+        return generate_library(size)
+    library = generate_library(size, seed=zlib.crc32(tenant.encode()))
+    # Different songs need different IDs and ISRCs, or the shared match cache would mix them up
+    return [track._replace(id=f"{tenant}_{track.id}", isrc=f"{track.isrc}{tenant}" if track.isrc else None) for track in library]
+
+def install_tenant_clients(library, quota, latency):
+    class Spotify(FakeSpotify):
+        def __init__(self, *args, **kwargs):
+            super().__init__({"Benchmark": library}, (), latency, quota)
+    class YTClient(FakeYTMusic):
+        def __init__(self, *args, **kwargs):
+            super().__init__(library, latency, quota, missing_rate=0.02, hard_rate=0.05)
+    install_fake_clients(Spotify, YTClient)
+
+def main(argv):
+    tenant = os.path.basename(os.path.normpath(argv[argv.index("--config-dir") + 1]))
+    library = tenant_library(tenant, int(os.environ.get("FAKE_SIZE", 500)), os.environ.get("FAKE_SAME_LIBRARY") == "1")
+    install_tenant_clients(library, float(os.environ.get("FAKE_QUOTA", 100)), float(os.environ.get("FAKE_LATENCY", 0.02)))
+    musicMigrator.beep = lambda: None
+    return musicMigrator.run_cli(argv)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,48 @@
+from fake_backend import FakeService
+
+class FakeSpotifyError(Exception):
+    # Same attributes as spotipy.SpotifyException, so musicMigrator retries it the same way
+    def __init__(self, http_status, headers=None):
+        super().__init__(f"http status: {http_status}")
+        self.http_status = http_status
+        self.headers = headers or {}
+
+class FakeSpotify(FakeService):
+    # Local stand-in for the spotipy.Spotify calls used by musicMigrator.
+    # playlists maps playlist names to lists of musicMigrator.Track, favorites is the list of liked songs.
+    def __init__(self, playlists=None, favorites=(), latency=0.05, max_rps=None, error_rate=0.0, throttle=False):
+        super().__init__(latency, max_rps, error_rate, throttle)
+        self.playlists = {f"sp_playlist_{n}": (name, list(tracks)) for n, (name, tracks) in enumerate((playlists or {}).items())}
+        self.favorites = list(favorites)
+
+    def _error(self, status, retry_after=None):
+        return FakeSpotifyError(status, {"Retry-After": f"{retry_after:.3f}"} if retry_after else None)
+
+    @staticmethod
+    def _page(tracks, limit, offset):
+        return {"total": len(tracks), "items": [{"track": {"id": track.id, "name": track.name, "duration_ms": track.duration_ms,
+                                                           "external_ids": {"isrc": track.isrc} if track.isrc else {},
+                                                           "album": {"name": track.album}, "artists": [{"name": a} for a in track.artists or (track.artist,)]}}
+                                                for track in tracks[offset:offset + limit]]}
+
+    def current_user(self):
+        self._request("current_user")
+        return {"id": "fake_user", "display_name": "Fake user"}
+
+    def user_playlists(self, user, limit=50, offset=0):
+        self._request("user_playlists")
+        playlists = list(self.playlists.items())
+        return {"total": len(playlists), "items": [{"id": playlist_id, "name": name, "snapshot_id": f"snap_{len(tracks)}", "tracks": {"total": len(tracks)}}
+                                                  for playlist_id, (name, tracks) in playlists[offset:offset + limit]]}
+
+    def playlist(self, playlist_id, fields=None):
+        self._request("playlist")
+        return {"snapshot_id": f"snap_{len(self.playlists[playlist_id][1])}"}
+
+    def playlist_tracks(self, playlist_id, fields=None, limit=100, offset=0):
+        self._request("playlist_tracks")
+        return self._page(self.playlists[playlist_id][1], limit, offset)
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        self._request("current_user_saved_tracks")
+        return self._page(self.favorites, limit, offset)
@@ -0,0 +1,92 @@
+import itertools
+import random
+import re
+
+from fake_backend import FakeService
+
+class FakeYTMusic(FakeService):
+    # Local stand-in for the YTMusic calls used by musicMigrator, with artificial latency
+    def __init__(self, library, latency=0.05, max_rps=None, rejected_ids=(), error_rate=0.0, throttle=False, missing_rate=0.0, hard_rate=0.0,
+                 isrc_miss_rate=0.0):
+        super().__init__(latency, max_rps, error_rate, throttle)
+        self.rejected_ids = set(rejected_ids)  # videoIds that make add_playlist_items fail
+        self.playlists = {}
+        self._catalog = {}  # Exact query -> song results
+        self._by_words = {}  # Words of the title without "- Remastered"-like suffixes and brackets, and of the artist -> song results
+        self._videos = {}  # Same keys as _by_words -> video results
+        self._ids = itertools.count(1)
+        isrc_rng = random.Random(0)
+        for n, track in enumerate(library):  # musicMigrator.Track or (name, artist, id) tuples
+            if missing_rate and n % round(1 / missing_rate) == 0:  # Songs that aren't on YTmusic
+                continue
+            name, artist, track_id = track[:3]
+            results = [
+                {"videoId": f"vid_{track_id}", "title": name, "artists": [{"name": artist}]},
+                {"videoId": f"vid_{track_id}_cover", "title": f"{name} (Cover)", "artists": [{"name": "Someone Else"}]},
+            ]
+            duration_ms = getattr(track, "duration_ms", None)
+            if duration_ms:
+                results[0]["duration_seconds"] = duration_ms // 1000
+                results[1]["duration_seconds"] = duration_ms // 1000 + 30
+            clean_name = re.sub(r"\s[-–]\s.*$|[(\[].*?[)\]]", " ", name)
+            self._by_words[self._words(f"{clean_name} {artist}")] = results
+            self._videos[self._words(f"{clean_name} {artist}")] = [
+                {"videoId": f"vid_{track_id}_video", "title": f"{artist} - {clean_name.strip()} (Official Video)", "artists": [{"name": artist}],
+                 "duration_seconds": results[0].get("duration_seconds")}]
+            if hard_rate and n % round(1 / hard_rate) == 1 and clean_name.strip() != name:
+                # Songs whose full Spotify title confuses the search: it only returns other songs, and the ISRC isn't known
+                self._catalog[f"{name} {artist}".lower()] = [{"videoId": f"other_{track_id}_{k}", "title": f"Another Song {k}",
+                                                               "artists": [{"name": f"Another Artist {k}"}]} for k in range(3)]
+                continue
+            self._catalog[f"{name} {artist}".lower()] = results
+            if getattr(track, "isrc", None) and not (isrc_miss_rate and isrc_rng.random() < isrc_miss_rate):  # Others aren't found by ISRC
+                self._catalog[track.isrc.lower()] = results[:1]
+
+    @staticmethod
+    def _words(text):
+        return " ".join(sorted(set(re.findall(r"\w+", text.lower()))))
+
+    def get_account_info(self):
+        self._request("get_account_info")
+        return {"accountName": "Fake user"}
+
+    def search(self, query, filter=None, limit=20, ignore_spelling=False):
+        self._request("search")
+        if filter == "videos":
+            return self._videos.get(self._words(query), [])[:limit]
+        results = self._catalog.get(query.lower())
+        return (results if results is not None else self._by_words.get(self._words(query), []))[:limit]
+
+    def create_playlist(self, title, description, privacy_status="PRIVATE", video_ids=None):
+        self._request("create_playlist")
+        playlist_id = f"PL{next(self._ids)}"
+        self.playlists[playlist_id] = {"title": title, "videoIds": list(video_ids or [])}
+        return playlist_id
+
+    def add_playlist_items(self, playlistId, videoIds=None, source_playlist=None, duplicates=False):
+        self._request("add_playlist_items")
+        if self.rejected_ids.intersection(videoIds or []):
+            raise Exception("Server returned HTTP 409: Conflict.")
+        self.playlists[playlistId]["videoIds"].extend(videoIds or [])
+        return {"status": "STATUS_SUCCEEDED"}
+
+    def get_playlist(self, playlistId, limit=100, related=False, suggestions_limit=0):
+        self._request("get_playlist")
+        video_ids = self.playlists[playlistId]["videoIds"]
+        return {"id": playlistId, "title": self.playlists[playlistId]["title"],
+                "tracks": [{"videoId": video_id, "setVideoId": f"set_{n}_{video_id}"} for n, video_id in enumerate(video_ids)]}
+
+    def remove_playlist_items(self, playlistId, videos):
+        self._request("remove_playlist_items")
+        removed = {video["setVideoId"] for video in videos}
+        video_ids = self.playlists[playlistId]["videoIds"]
+        self.playlists[playlistId]["videoIds"] = [v for n, v in enumerate(video_ids) if f"set_{n}_{v}" not in removed]
+        return "STATUS_SUCCEEDED"
+
+    def get_library_playlists(self, limit=25):
+        self._request("get_library_playlists")
+        return [{"title": p["title"], "playlistId": pid, "count": len(p["videoIds"])} for pid, p in self.playlists.items()]
+
+    def delete_playlist(self, playlistId):
+        self._request("delete_playlist")
+        self.playlists.pop(playlistId, None)
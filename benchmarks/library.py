@@ -0,0 +1,26 @@
+import random
+
+WORDS = ("love night heart fire dream light rain summer blue gold wild river road home city star dance soul time ghost "
+         "paper echo ocean young broken electric silver midnight garden storm").split()
+SUFFIXES = ("", "", "", "", " - Remastered 2011", " (Live)", " - Radio Edit", " (feat. {})", " - Acoustic")
+
+def generate_library(size, seed=0):
+    # Returns size musicMigrator.Track with realistic names, a few popular artists and many rare ones, and some missing ISRCs
+    import musicMigrator
+    rng = random.Random(seed)
+    artists = [f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {n}" for n in range(max(size // 10, 1))]
+    tracks = []
+    for n in range(size):
+        artist = artists[min(int(rng.paretovariate(1.2)) - 1, len(artists) - 1)] if rng.random() < 0.5 else rng.choice(artists)
+        featured = rng.choice(artists)
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title() + rng.choice(SUFFIXES).format(featured)
+        isrc = f"US{rng.choice('ABCDEFGH')}{rng.randint(10, 99)}{n:07d}" if rng.random() < 0.9 else None
+        tracks.append(musicMigrator.Track(name, artist, f"sp{n:020d}", isrc, rng.randint(120000, 360000), f"{rng.choice(WORDS).title()} Album",
+                                          (artist, featured) if "feat." in name else (artist,)))
+    return tracks
+
+def split_playlists(tracks, count, seed=0):
+    # count playlists drawn from tracks, songs can appear in several of them like in a real library
+    rng = random.Random(seed)
+    size = max(len(tracks) // count, 1)
+    return {f"Playlist {n}": rng.sample(tracks, min(size, len(tracks))) for n in range(count)}
@@ -1,21 +1,87 @@
 import os
 import re
+import sys
+import argparse
 import json
 import time
-import spotipy
-import winsound
-from datetime import date
+import random
+import cProfile
+import sqlite3
+import subprocess
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
 from difflib import SequenceMatcher
-from spotipy.oauth2 import SpotifyOAuth
-from ytmusicapi import YTMusic, OAuthCredentials
-from ytmusicapi.exceptions import YTMusicServerError
+from functools import lru_cache, partial
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_DIR = os.path.join(BASE_DIR, "config")
 #CONFIG_DIR = "config"
 MISMATCH_DIR = "mismatch_files"
+MISMATCH_INDEX_FILE = "index.json"  # Saved in MISMATCH_DIR, number of songs in every mismatch file
+MISMATCH_CANDIDATES = 3  # Best search results (with their scores) saved for every song that couldn't be matched
 freq = 1000  # Beep frequency used to notify the user when a process is complete
 tempo = 1000  # Beep time
+MAX_WORKERS = 8  # Number of songs searched on YTmusic at the same time
+PAGE_WORKERS = 4  # Pages of Spotify results downloaded at the same time
+YT_RATE_LIMIT = 10  # Max requests per second sent to YTmusic, lowered automatically while it's throttling
+SPOTIFY_RATE_LIMIT = 10  # Max requests per second sent to Spotify
+MAX_RETRIES = 5  # Times a throttled or failed API call is retried before giving up
+BACKOFF_BASE = 1  # Seconds waited before the first retry, doubled at every attempt
+BACKOFF_MAX = 60
+HTTP_TIMEOUT = 30  # Seconds an API request can wait for the server before failing (and being retried)
+DURATION_TOLERANCE = 5  # Seconds of difference allowed between a Spotify song and a YTmusic result of the same recording
+ISRC_RESULTS = 3  # Results read when searching a song by its ISRC code
+ISRC_MIN_HIT_RATE = 0.5  # ISRC searches are skipped while fewer than this fraction of the last ISRC_SAMPLE ones found their song (below it they cost more searches than they save)
+ISRC_SAMPLE = 50  # ISRC searches the hit rate is measured on, while skipping 1 song in ISRC_SAMPLE is still searched by ISRC
+MATCH_ENGINE = "fast"  # How search results are compared to Spotify songs, see MATCH_ENGINES
+VERSION_PENALTY = 0.6  # Score lost by a search result of another version of the song (live, remix, acoustic...) with the "fast" engine
+VERSION_WORDS = frozenset("live acoustic remix mix instrumental karaoke cover demo unplugged acapella".split())  # Words marking such a version
+MATCH_THRESHOLD = 0.5  # Minimum score (0-2) of a search result to be accepted as the YTmusic version of a song
+CONFIDENT_SCORE = 1.5  # Score above which a search result is taken without trying the fallback searches
+SEARCH_FALLBACK = True  # Search the cleaned title and the videos too when the first search isn't convincing
+BATCH_SIZE = 50  # Number of songs added to a YTmusic playlist with a single request
+FLUSH_INTERVAL = 10  # Seconds after which buffered songs are added even if the batch isn't full
+MATCH_CACHE_FILE = "match_cache.db"  # Saved in CONFIG_DIR (or anywhere with an absolute path), remembers which YTmusic song was chosen for each Spotify track
+MATCH_CACHE_TTL = 30 * 24 * 3600  # Seconds a saved match is reused before the song is searched again
+MISS_CACHE_TTL = 24 * 3600  # Seconds a song that couldn't be matched is skipped before being searched again
+MATCH_CACHE_SIZE = 200000  # Max number of saved matches, the least recently used ones are deleted first
+SEARCH_CACHE_TTL = 7 * 24 * 3600  # Seconds YTmusic search results are reused for the same (normalized) query
+SEARCH_CACHE_MEMORY = 5000  # Searches kept in memory, the least recently used ones are dropped first
+SEARCH_CACHE_SIZE = 200000  # Max number of searches saved on disk (in the MATCH_CACHE_FILE database)
+SYNC_STATE_FILE = "sync_state.json"  # Saved in CONFIG_DIR, remembers which YTmusic playlist each Spotify playlist was copied to
+TENANTS_DIR = os.path.join(BASE_DIR, "tenants")  # One folder per account pair migrated by the scheduler, used as its CONFIG_DIR
+SCHEDULER_DB = "scheduler.db"  # Saved in TENANTS_DIR, queue of the scheduler's jobs, together with the match cache shared by all tenants
+SCHEDULER_TENANTS = 4  # Tenants migrated at the same time by the scheduler
+SCHEDULER_WORKERS = 32  # Songs searched at the same time by all the running tenants together, split evenly between them
+JOB_ATTEMPTS = 3  # Times a failing job is started before being marked as failed
+JOB_BACKOFF = 60  # Seconds waited before starting a failed job again, doubled at every attempt
+SETTINGS_FILE = "settings.json"  # Saved in CONFIG_DIR, optional, overrides the settings above (lowercase) and the defaults of the migrate command
+SETTINGS = ["MAX_WORKERS", "PAGE_WORKERS", "YT_RATE_LIMIT", "SPOTIFY_RATE_LIMIT", "MAX_RETRIES", "BACKOFF_BASE", "BACKOFF_MAX", "HTTP_TIMEOUT",
+            "DURATION_TOLERANCE", "ISRC_RESULTS", "ISRC_MIN_HIT_RATE", "ISRC_SAMPLE", "MATCH_ENGINE", "VERSION_PENALTY", "MATCH_THRESHOLD", "CONFIDENT_SCORE", "SEARCH_FALLBACK", "BATCH_SIZE", "FLUSH_INTERVAL", "MATCH_CACHE_TTL", "MISS_CACHE_TTL",
+            "MATCH_CACHE_SIZE", "SEARCH_CACHE_TTL", "SEARCH_CACHE_MEMORY", "SEARCH_CACHE_SIZE", "MISMATCH_DIR",
+            "SCHEDULER_TENANTS", "SCHEDULER_WORKERS", "JOB_ATTEMPTS", "JOB_BACKOFF"]
+MIGRATE_OPTIONS = ["playlists", "all", "fav", "sync", "remove_missing", "resume", "yes", "concurrency", "batch_size"]
+ASSUME_YES = False  # Set by --yes, every question is answered 'y' without waiting for the user
+# Spotify song as used by the migrator, isrc is the international code of the recording (shared by its re-releases)
+Track = namedtuple("Track", "name artist id isrc duration_ms album artists", defaults=(None, None, None, ()))
+match_cache = None
+search_cache = None
+playlist_snapshots = {}  # Spotify playlist ID -> snapshot_id, changes every time the playlist is modified
+match_cache_lock = threading.Lock()
+fallback_executor = None  # Runs the fallback searches of match_by_search, see get_fallback_executor
+http_session = None  # requests.Session shared by both API clients, see get_http_session
+http_session_lock = threading.Lock()
+retryable_errors = (OSError,)  # Errors without an HTTP status that are retried, YTMusicServerError is added when ytmusicapi is loaded
+mismatch_index_lock = threading.Lock()
+run_stats = None  # RunStats of the current session, see get_run_stats
+isrc_gate = None  # IsrcGate of the current session, see get_isrc_gate
+yt_library = None  # YTmusic playlist title -> playlist IDs, see get_yt_library
+session_users = {}  # "Spotify"/"YTmusic" -> account info, read once when connecting and reused for the whole session
 yt = None #variabili globali che rappresentano l'uso delle api di spotify e ytmusic
 sp = None
 
@@ -23,6 +89,50 @@ def ensure_config_dir():
     if not os.path.exists(CONFIG_DIR):
         os.makedirs(CONFIG_DIR)
 
+def beep():
+    # winsound only exists on Windows, elsewhere (e.g. on a server) the end of a process isn't notified
+    try:
+        import winsound
+    except ImportError:
+        return
+    winsound.Beep(freq, tempo)
+
+def ask_yes_no(question):
+    # Answers 'y' without asking with --yes, and 'n' when nobody can answer (e.g. when running from cron)
+    if ASSUME_YES:
+        print(f"{question} (y/n) y")
+        return True
+    try:
+        choice = input(f"{question} (y/n) ")
+        while choice.strip().lower() not in ['y', 'n']:
+            choice = input("Unrecognized input. ")
+    except EOFError:
+        print("n")
+        return False
+    return choice.strip().lower() == 'y'
+
+def load_settings(path=None):
+    # Settings named like the constants above (lowercase) replace them, e.g. {"max_workers": 4, "batch_size": 100}.
+    # The other keys are the defaults of the migrate command options, e.g. {"playlists": ["Rock"], "fav": true, "yes": true}
+    if path is None:
+        path = os.path.join(CONFIG_DIR, SETTINGS_FILE)
+        if not os.path.exists(path):
+            return {}
+    try:
+        with open(path, "r", encoding="utf-8-sig") as file:
+            settings = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Error while reading settings from {path}: {e}")
+    options = {}
+    for key, value in settings.items():
+        if key.upper() in SETTINGS:
+            globals()[key.upper()] = value
+        elif key.replace("-", "_") in MIGRATE_OPTIONS:
+            options[key.replace("-", "_")] = value
+        else:
+            raise ValueError(f"Unknown setting '{key}' in {path}")
+    return options
+
 def UninstallAll():  # CURRENTLY NOT SUPPORTED
     print("Caution, this process will uninstall resources needed to run this program. Do you wish to proceed? (y/n)")
     confirm = input().strip().lower()
@@ -31,22 +141,269 @@ def UninstallAll():  # CURRENTLY NOT SUPPORTED
         return True
     return False
 
+class RunStats:
+    # Latencies of the stages of a run (fetch, search, match, insert, mismatch_write) and a summary of every transfer,
+    # saved as a JSON report next to the mismatch files when the session ends
+    STAGES = ["fetch", "search", "match", "insert", "mismatch_write"]
+
+    def __init__(self):
+        self.started = time.time()
+        self.timings = {}
+        self.transfers = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.timings.setdefault(name, array("d")).append(seconds)
+
+    def add_transfer(self, playlist, **summary):
+        with self._lock:
+            self.transfers.append({"playlist": playlist, **summary})
+
+    def summary(self):
+        stages = {}
+        for name, timings in self.timings.items():
+            values = sorted(timings)
+            percentile = lambda p: round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 2)
+            stages[name] = {"count": len(values), "total_s": round(sum(values), 3), "p50_ms": percentile(50),
+                            "p95_ms": percentile(95), "p99_ms": percentile(99), "max_ms": round(values[-1] * 1000, 2)}
+        return stages
+
+    def report(self):
+        services = {client.name: client.stats() for client in (yt, sp) if isinstance(client, RateLimitedClient)}
+        return {"started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "duration_s": round(time.time() - self.started, 3),
+                "settings": {name: globals()[name] for name in ("MAX_WORKERS", "PAGE_WORKERS", "BATCH_SIZE", "MATCH_ENGINE")},
+                "stages": self.summary(),
+                "services": services,
+                "search_cache": search_cache.stats() if search_cache is not None else None,
+                "isrc": isrc_gate.stats() if isrc_gate is not None else None,
+                "http": http_session_stats(),
+                "transfers": self.transfers}
+
+    def save(self):
+        # Returns the path of the report, None if nothing was measured
+        if not self.timings and not self.transfers:
+            return None
+        ensure_mismatch_dir()
+        path = os.path.join(MISMATCH_DIR, f"run_report_{datetime.fromtimestamp(self.started).strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        return path
+
+def get_run_stats():
+    global run_stats
+    with match_cache_lock:
+        if run_stats is None:
+            run_stats = RunStats()
+    return run_stats
+
+class IsrcGate:
+    # An ISRC search costs as much as a text search, and a song it doesn't find needs the text search too.
+    # When most of the recent ISRC searches missed (e.g. a library of local files or indie releases) they are skipped,
+    # except for a few probes that notice if they start finding songs again.
+    def __init__(self, sample=None, min_hit_rate=None):
+        self.min_hit_rate = ISRC_MIN_HIT_RATE if min_hit_rate is None else min_hit_rate
+        self.recent = deque(maxlen=sample or ISRC_SAMPLE)
+        self.tried = 0
+        self.hits = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def should_try(self):
+        with self._lock:
+            if len(self.recent) < self.recent.maxlen or sum(self.recent) >= self.min_hit_rate * len(self.recent):
+                return True
+            self.skipped += 1
+            return self.skipped % self.recent.maxlen == 0
+
+    def record(self, hit):
+        with self._lock:
+            self.recent.append(hit)
+            self.tried += 1
+            self.hits += hit
+
+    def stats(self):
+        return {"tried": self.tried, "hits": self.hits, "skipped": self.skipped}
+
+def get_isrc_gate():
+    global isrc_gate
+    with match_cache_lock:
+        if isrc_gate is None:
+            isrc_gate = IsrcGate()
+    return isrc_gate
+
+class TokenBucket:
+    # Allows `rate` requests per second on average, the rate is halved when the server throttles and slowly raised back
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.max_rate / 20, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+class RateLimitedClient:
+    # Wraps the YTMusic or Spotify client: every API call waits for the rate limiter and is retried
+    # with exponential backoff when the server throttles (429), fails (5xx) or the connection drops
+    def __init__(self, client, name, rate):
+        self._client = client
+        self.name = name
+        self.bucket = TokenBucket(rate)
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.method_calls = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        value = getattr(self._client, attr)
+        if attr.startswith("_") or not callable(value):
+            return value
+        return lambda *args, **kwargs: self._call(value, args, kwargs)
+
+    def _call(self, method, args, kwargs):
+        for attempt in range(MAX_RETRIES + 1):
+            self.bucket.acquire()
+            with self._lock:
+                self.calls += 1
+                self.method_calls[method.__name__] = self.method_calls.get(method.__name__, 0) + 1
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                status = get_http_status(e)
+                if not is_retryable(e, status) or attempt == MAX_RETRIES:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                    if status == 429:
+                        self.throttles += 1
+                if status == 429 or (status or 0) >= 500:
+                    self.bucket.slow_down()
+                delay = get_retry_after(e) or min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+                time.sleep(delay)
+                continue
+            self.bucket.speed_up()
+            return result
+
+    def stats(self):
+        return {"calls": self.calls, "retries": self.retries, "throttles": self.throttles, "rate": round(self.bucket.rate, 2), "methods": dict(self.method_calls)}
+
+def is_retryable(error, status=None):
+    # Throttling, server errors and dropped connections, as opposed to a request the server rejected
+    status = get_http_status(error) if status is None else status
+    return status == 429 or (status or 0) >= 500 or (status is None and isinstance(error, retryable_errors))
+
+def get_http_status(error):
+    status = getattr(error, "http_status", None)  # spotipy.SpotifyException
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)  # requests.HTTPError
+    if status is None:
+        found = re.search(r"HTTP (\d{3})", str(error))  # YTMusicServerError: "Server returned HTTP 409: Conflict."
+        status = int(found.group(1)) if found else None
+    return status
+
+def get_retry_after(error):
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(BACKOFF_MAX, float(headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+def print_client_stats():
+    for client in (yt, sp):
+        if isinstance(client, RateLimitedClient) and client.calls:
+            stats = client.stats()
+            print(f"{client.name}: {stats['calls']} API calls, {stats['retries']} retries, {stats['throttles']} throttled, final rate {stats['rate']}/s")
+    for host, stats in http_session_stats().items():
+        print(f"{host}: {stats['opened']} connections opened, {stats['reused']} requests on a reused connection")
+
+def get_http_session():
+    # Kept-alive connections to YTmusic and Spotify are shared by both clients and reused by every request, so only the first
+    # request to each host pays for a new TLS handshake. Each host gets enough connections for all the threads that can call it.
+    # Returns None if requests can't be imported (e.g. with stand-in API libraries), the clients then use their own sessions.
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            try:
+                import requests
+                from requests.adapters import HTTPAdapter
+            except ImportError:
+                return None
+            searches = MAX_WORKERS * 3 if SEARCH_FALLBACK else MAX_WORKERS  # First searches plus the fallback executor's threads
+            pool_size = max(searches + 1, PAGE_WORKERS)  # Searches plus the playlist inserter, or the Spotify pages
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size, max_retries=0)  # Retries are handled by RateLimitedClient
+            http_session = requests.Session()
+            http_session.mount("https://", adapter)
+            http_session.mount("http://", adapter)
+            # ytmusicapi only sets a timeout on the sessions it creates, without one a stalled connection blocks a thread forever
+            http_session.request = partial(http_session.request, timeout=HTTP_TIMEOUT)
+    return http_session
+
+def http_session_stats():
+    # Connections opened and requests sent on an already open one, for every host contacted
+    stats = {}
+    if http_session is None:
+        return stats
+    for adapter in set(http_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            host = stats.setdefault(pool.host, {"opened": 0, "reused": 0})
+            host["opened"] += pool.num_connections
+            host["reused"] += pool.num_requests - pool.num_connections
+    return stats
+
 def isYTmusicAPI_connected():
+    # Only the first check of the session calls the API
     global yt
-    try:
-        user_info = yt.get_authenticated_user()
-        if user_info:
-            print(f"YTMusic is already connected: {user_info['user']['name']}")
-            return True
-        else:
-            return False
-    except Exception as e:
-        #print(f"Error checking YTMusic connection: {e}")
+    if yt is None:
         return False
-        
+    if "YTmusic" not in session_users:
+        try:
+            session_users["YTmusic"] = yt.get_account_info()
+        except Exception as e:
+            #print(f"Error checking YTMusic connection: {e}")
+            return False
+    print(f"YTMusic is already connected: {session_users['YTmusic'].get('accountName', 'Unknown')}")
+    return True
+
+
 def connectToYTmusicAPI():
-    global yt
+    global yt, retryable_errors
     try:
+        from ytmusicapi import YTMusic, OAuthCredentials
+        from ytmusicapi.exceptions import YTMusicServerError
+        retryable_errors = (OSError, YTMusicServerError)
         ensure_config_dir()
         with open(os.path.join(CONFIG_DIR, "ytmusic_auth.json"), "r", encoding="utf-8-sig") as file:
             content = file.read().strip()
@@ -63,8 +420,11 @@ def connectToYTmusicAPI():
         YT_CLIENT_SECRET = installed.get("client_secret")
         if not YT_CLIENT_ID or not YT_CLIENT_SECRET:
             raise ValueError("Client ID or Secret missing in ytmusic_auth.json file.")
-        yt = YTMusic(os.path.join(CONFIG_DIR, "oauth.json"), oauth_credentials=OAuthCredentials(client_id=YT_CLIENT_ID, client_secret=YT_CLIENT_SECRET))
+        session = get_http_session()
+        yt = RateLimitedClient(YTMusic(os.path.join(CONFIG_DIR, "oauth.json"), requests_session=session,
+                                       oauth_credentials=OAuthCredentials(client_id=YT_CLIENT_ID, client_secret=YT_CLIENT_SECRET, session=session)), "YTmusic", YT_RATE_LIMIT)
         account_info = yt.get_account_info()
+        session_users["YTmusic"] = account_info
         account_name = account_info.get("accountName", "Unknown")
         if account_name:
             print("YTMusic connected successfully to:", account_name)
@@ -72,20 +432,24 @@ def connectToYTmusicAPI():
         raise RuntimeError(f"Error while trying to connect to YTMusicAPI: {e}")
 
 def isSpotifyAPI_connected():
+    # Only the first check of the session calls the API
     global sp
-    try:
-        user = sp.current_user()
-        print("Spotify is already connected:", user["display_name"])
-        return True
-    except spotipy.SpotifyException:
-        return False
-    except Exception as e:
-        #print(f"Error checking Spotify connection: {e}")
+    if sp is None:
         return False
+    if "Spotify" not in session_users:
+        try:
+            session_users["Spotify"] = sp.current_user()
+        except Exception as e:
+            #print(f"Error checking Spotify connection: {e}")
+            return False
+    print("Spotify is already connected:", session_users["Spotify"]["display_name"])
+    return True
 
 def connectToSpotifyAPI():
     global sp
     try:
+        import spotipy
+        from spotipy.oauth2 import SpotifyOAuth
         ensure_config_dir()
         with open(os.path.join(CONFIG_DIR, "spotify_auth.json"), "r", encoding="utf-8-sig") as file:
             content = file.read().strip()  # Read and strip whitespace
@@ -106,10 +470,13 @@ def connectToSpotifyAPI():
             client_secret=SPOTIFY_CLIENT_SECRET,
             redirect_uri="http://127.0.0.1:8888/callback",
             scope="user-library-read playlist-read-private playlist-read-collaborative",
-            cache_path=os.path.join(CONFIG_DIR, "spotify_token.json")
+            cache_path=os.path.join(CONFIG_DIR, "spotify_token.json"),
+            requests_session=get_http_session()
         )
-        sp = spotipy.Spotify(auth_manager=auth_manager)
+        # Retries are handled by RateLimitedClient, so spotipy's own ones are turned off
+        sp = RateLimitedClient(spotipy.Spotify(auth_manager=auth_manager, requests_session=get_http_session(), retries=0, status_retries=0), "Spotify", SPOTIFY_RATE_LIMIT)
         user = sp.current_user()
+        session_users["Spotify"] = user
         if user:
             print("Spotify connected successfully to:", user["display_name"])
     except Exception as e:
@@ -118,20 +485,16 @@ def connectToSpotifyAPI():
 def getPlaylists(source):
     global sp, yt
     playlists = []
-    offset = 0
     if source == "Spotify":
         try:
-            user_id = sp.current_user()["id"]  # Ottiene l'ID dell'utente autenticato
-            while True:
-                response = sp.user_playlists(user_id, offset=offset)
-                if not response["items"]:
-                    break
+            user_id = (session_users.get("Spotify") or sp.current_user())["id"]  # Ottiene l'ID dell'utente autenticato
+            for response in fetch_pages(lambda offset: sp.user_playlists(user_id, limit=50, offset=offset), 50):
                 for playlist in response["items"]:
                     playlist_name = playlist["name"]
                     track_count = playlist["tracks"]["total"]
                     playlist_id = playlist["id"]
+                    playlist_snapshots[playlist_id] = playlist.get("snapshot_id")
                     playlists.append((playlist_name, track_count, playlist_id))
-                offset += len(response["items"])  # Continua a prendere le playlist in caso siano molte
         except Exception as e:
             print(f"\nError while retrieving playlists from Spotify: {e}")
     elif source == "Ytmusic":
@@ -144,168 +507,541 @@ def getPlaylists(source):
                 playlists.append((playlist_name, track_count, playlist_id))
     return playlists
 
+def fetch_pages(fetch_page, page_size):
+    # Generator: downloads the first page, reads the total from it and downloads the other pages
+    # PAGE_WORKERS at a time, yielding them in order
+    stats = get_run_stats()
+    def fetch(offset):
+        with stats.stage("fetch"):
+            return fetch_page(offset)
+    first_page = fetch(0)
+    yield first_page
+    offsets = range(page_size, first_page.get("total") or 0, page_size)
+    with ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="fetch") as executor:
+        pending = deque()
+        for offset in offsets:
+            pending.append(executor.submit(fetch, offset))
+            if len(pending) >= PAGE_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
 def get_playlist_tracks(source, playlist_id):
+    # Generator: tracks are yielded page by page, so songs can be searched while the next pages are downloaded
     global sp, yt
-    songs = []
-    offset = 0
     if source == "Spotify":
+        fields = "total,items(track(id,name,duration_ms,external_ids(isrc),album(name),artists(name)))"  # Only what the migrator uses
         try:
-            while True:
-                playlist = sp.playlist_tracks(playlist_id, limit=100, offset=offset)
-                if not playlist["items"]:
-                    break
-                songs.extend([(track["track"]["name"], track["track"]["artists"][0]["name"], track["track"]["id"]) for track in playlist["items"]])
-                offset += 100
-            return songs
+            for playlist in fetch_pages(lambda offset: sp.playlist_tracks(playlist_id, fields=fields, limit=100, offset=offset), 100):
+                yield from [track_from_spotify(track["track"]) for track in playlist["items"] if track["track"]]
         except Exception as e:
             print(f"\nError while retrieving playlist tracks: {e}")
-            return None
+            raise
     elif source == "YTmusic":
         print("This process isn't supported yet.")
-        return None
 
-def transferPlaylist(sp_playlist_id, playlist_name, source, destination):
+def transferPlaylist(sp_playlist_id, playlist_name, source, destination, songs=None, resolved=None, resume=None, run_id=None, num_songs=None, replace_existing=True):
     global yt, sp
     file_directory = get_mismatch_directory(playlist_name)
     if source == "Youtube":
         print("This process isn't supported yet.")
     elif source == "Spotify":
-        check_and_delete_YTplaylists(playlist_name, False)
-        print(f"Fetching songs from {playlist_name}...")
-        songs = get_playlist_tracks(source, sp_playlist_id)
-        print(f"Beginning transfer of {len(songs)} songs to {playlist_name} from {source} to {destination}.")
+        if resume and resume["finished"]:
+            print(f"Playlist '{playlist_name}' was already transferred, skipping.")
+            return
+        if not resume and replace_existing:  # Otherwise the caller already checked it with the other playlists
+            check_and_delete_YTplaylists(playlist_name, False)
+        get_playlist_snapshot(sp_playlist_id)  # Saved with the sync state, before songs are read
+        if songs is None:
+            print(f"Fetching songs from {playlist_name}...")
+            songs = get_playlist_tracks(source, sp_playlist_id)
+        started = time.perf_counter()
+        total = len(songs) if isinstance(songs, list) else num_songs
+        journal = TransferJournal(playlist_name)
+        if resume:
+            songs = (song for song in songs if track_key(song) not in resume["done"])
+            total = total - len(resume["done"]) if total is not None else None
+            yt_playlist_id = resume["yt_playlist_id"]
+            print(f"Resuming transfer of {playlist_name}: {len(resume['done'])} songs already done, {total} left.")
+        else:
+            print(f"Beginning transfer of {total} songs to {playlist_name} from {source} to {destination}.")
         print("\nThis process runs in the background. You may minimize this app.\n")
-        yt_playlist_id = yt.create_playlist(f"{playlist_name}", "Automatic copy from f{source}")
-        error_counter = 0
-        for idx, song in enumerate(songs, 1):
-            name, artist, song_id = song
-            try:
-                search_query = f"{name} {artist}"
-                search_results = yt.search(search_query, filter="songs", limit=10, ignore_spelling=True)
-                if not search_results: 
-                    raise ValueError("No search results found")
-                better_result = find_best_match(song, search_results)
-                if not better_result or 'videoId' not in better_result: 
-                    raise ValueError(f"Mismatch: song not found on YouTube Music.")
-                yt.add_playlist_items(yt_playlist_id, [better_result['videoId']])
-                video_title = better_result.get('title', 'Unknown')
-                video_artist = ', '.join([a['name'] for a in better_result.get('artists', [])])
-                print(f"[{idx}/{len(songs)}] Adding: {video_title} - {video_artist}")
-            except Exception as e:
-                with open(file_directory, "a", encoding="utf-8") as file:
-                    if error_counter == 0:
-                        file.write(f"Songs not added automatically from playlist '{playlist_name}' to YTmusic:\n")
-                    file.write(f"{name} - {artist}: {e}\n")
-                print(f"Error while adding: {name} - {artist}: {e}")
-                error_counter += 1
+        if not resume:
+            yt_playlist_id = create_yt_playlist(f"{playlist_name}", "Automatic copy from f{source}")
+        journal.open(playlist_name, yt_playlist_id, run_id, resume=resume is not None)
+        output = TransferOutput(yt_playlist_id, file_directory, playlist_name, f"Songs not added automatically from playlist '{playlist_name}' to YTmusic:",
+                                journal, resume["errors"] if resume else 0)
+        with output:  # Also when reading the playlist fails midway, the songs already matched are still added
+            for idx, (song, better_result, error) in enumerate(resolve_songs(songs, resolved=resolved), 1):
+                if error:
+                    output.error(song, error)
+                    continue
+                output.add(song, better_result.video_id)
+                video_title = better_result.title or 'Unknown'
+                video_artist = ', '.join(better_result.artists)
+                print(f"[{idx}/{total}] Adding: {video_title} - {video_artist}")
+        journal.finish()
+        get_run_stats().add_transfer(playlist_name, matched=len(output.matched), added=output.inserter.added, errors=output.errors,
+                                     insert_requests=output.inserter.requests, seconds=round(time.perf_counter() - started, 3))
+        video_ids = dict(resume["video_ids"]) if resume else {}  # Songs added before the interruption
+        video_ids.update((track_key(song), video_id) for video_id, song in output.matched.items())
+        save_sync_state(sp_playlist_id, yt_playlist_id, video_ids)
         
-        winsound.Beep(freq, tempo)
-        print(f"Transfer completed. Check {file_directory} for any errors. ({error_counter} errors)")
+        beep()
+        print(f"Transfer completed. Check {file_directory} for any errors. ({output.errors} errors)")
+        return
+
+def syncPlaylist(sp_playlist_id, playlist_name, remove_missing=False):
+    # Only adds the songs that aren't already in the YTmusic copy of the playlist (and optionally removes the dropped ones)
+    global yt, sp
+    state = load_sync_state().get(sp_playlist_id)
+    snapshot_id = get_playlist_snapshot(sp_playlist_id)
+    if state and snapshot_id and state["snapshot_id"] == snapshot_id:
+        print(f"Playlist '{playlist_name}' is already up to date.")
         return
+    yt_tracks = None
+    if state:
+        try:
+            yt_tracks = yt.get_playlist(state["yt_playlist_id"], limit=None)["tracks"]
+            yt_playlist_id = state["yt_playlist_id"]
+        except Exception as e:
+            print(f"Error while retrieving '{playlist_name}' from YTmusic, looking for it by name: {e}")
+    if yt_tracks is None:
+        existing = get_yt_library().get(playlist_name)
+        if existing:
+            yt_playlist_id = existing[0]
+            yt_tracks = yt.get_playlist(yt_playlist_id, limit=None)["tracks"]
+        else:
+            yt_playlist_id = create_yt_playlist(f"{playlist_name}", "Automatic copy from Spotify")
+            yt_tracks = []
+    print(f"Fetching songs from {playlist_name}...")
+    songs = list(get_playlist_tracks("Spotify", sp_playlist_id))  # Every song is needed to know which ones were dropped
+    known_ids = state["video_ids"] if state else {}
+    present = {track["videoId"] for track in yt_tracks if track.get("videoId")}
+    video_ids = {}
+    new_songs = []
+    for song in songs:
+        video_id = known_ids.get(track_key(song))
+        if video_id in present:
+            video_ids[track_key(song)] = video_id
+        else:
+            new_songs.append(song)
+    print(f"Syncing '{playlist_name}': {len(songs) - len(new_songs)} songs already on YTmusic, {len(new_songs)} to check.")
+    file_directory = get_mismatch_directory(playlist_name)
+    output = TransferOutput(yt_playlist_id, file_directory, playlist_name, f"Songs not added automatically from playlist '{playlist_name}' to YTmusic:")
+    with output:
+        for idx, (song, better_result, error) in enumerate(resolve_songs(new_songs), 1):
+            if error:
+                output.error(song, error)
+                continue
+            video_ids[track_key(song)] = better_result.video_id
+            if better_result.video_id in present:
+                continue
+            present.add(better_result.video_id)
+            output.add(song, better_result.video_id)
+            print(f"[{idx}/{len(new_songs)}] Adding: {better_result.title or 'Unknown'}")
+    removed = 0
+    if remove_missing:
+        dropped_ids = set(known_ids.values()) - set(video_ids.values())
+        dropped = [track for track in yt_tracks if track.get("videoId") in dropped_ids]
+        if dropped:
+            try:
+                yt.remove_playlist_items(yt_playlist_id, dropped)
+                removed = len(dropped)
+            except Exception as e:
+                print(f"Error while removing songs from '{playlist_name}': {e}")
+    get_run_stats().add_transfer(playlist_name, sync=True, matched=len(output.matched), added=output.inserter.added, removed=removed, errors=output.errors,
+                                 insert_requests=output.inserter.requests)
+    save_sync_state(sp_playlist_id, yt_playlist_id, video_ids)
+    print(f"Sync of '{playlist_name}' completed: {output.inserter.added} songs added, {removed} removed. ({output.errors} errors)")
+
+def get_playlist_snapshot(sp_playlist_id):
+    if not playlist_snapshots.get(sp_playlist_id):
+        try:
+            playlist_snapshots[sp_playlist_id] = sp.playlist(sp_playlist_id, fields="snapshot_id")["snapshot_id"]
+        except Exception as e:
+            print(f"\nError while retrieving playlist version from Spotify: {e}")
+            return None
+    return playlist_snapshots[sp_playlist_id]
+
+def load_sync_state():
+    path = os.path.join(CONFIG_DIR, SYNC_STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+def save_sync_state(sp_playlist_id, yt_playlist_id, video_ids):
+    # video_ids maps every song of the Spotify playlist (see track_key) to the videoId chosen for it
+    ensure_config_dir()
+    path = os.path.join(CONFIG_DIR, SYNC_STATE_FILE)
+    states = load_sync_state()
+    states[sp_playlist_id] = {"snapshot_id": playlist_snapshots.get(sp_playlist_id), "yt_playlist_id": yt_playlist_id, "video_ids": video_ids, "synced_at": time.time()}
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(states, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
 
 def getSPFavoriteTracks():
+    # Generator: liked songs are yielded page by page, like get_playlist_tracks
     global sp
-    favTracks = []
     try:
-        offset = 0
-        while True:
-            results = sp.current_user_saved_tracks(limit=50, offset=offset)
+        for results in fetch_pages(lambda offset: sp.current_user_saved_tracks(limit=50, offset=offset), 50):
             for item in results['items']:
-                track_name = item['track']['name']
-                artist_name = item['track']['artists'][0]['name']
-                track_id = item['track']['id']
-                favTracks.append((track_name, artist_name, track_id))
-            if len(results['items']) < 50:
-                break
-            offset += 50
-        return favTracks
+                yield track_from_spotify(item['track'])
     except Exception as e:
         print(f"\nError while retrieving favorite tracks: {e}")
-        return None
+        raise
 
-def copyFavSongs_toYT_playlist(favTracks):
-    global yt
-    playlist_title = f"Favorite songs from Spotify ({date.today().strftime('%d/%m/%Y')})"
-    file_directory = get_mismatch_directory(None)
+def track_from_spotify(track):
+    artists = tuple(sys.intern(a["name"]) for a in track["artists"])  # The same artists repeat across playlists
+    isrc = (track.get("external_ids") or {}).get("isrc")
+    album = (track.get("album") or {}).get("name")
+    return Track(track["name"], artists[0], track["id"], isrc, track.get("duration_ms"), album and sys.intern(album), artists)
+
+def getSPFavoriteCount():
+    global sp
     try:
-        yt_playlist_id = yt.create_playlist(title=playlist_title, description="Automatic transfer from Spotify")
+        return sp.current_user_saved_tracks(limit=1)['total']
     except Exception as e:
-        print(f"\nError creating playlist: {e}")
+        print(f"\nError while retrieving favorite tracks: {e}")
+        return 0
+
+def copyFavSongs_toYT_playlist(favTracks, resolved=None, resume=None, run_id=None, num_songs=None):
+    global yt
+    if resume and resume["finished"]:
+        print(f"'{resume['title']}' was already transferred, skipping.")
         return
-    print(f"\nStarting transfer of {len(favTracks)} songs to playlist: '{playlist_title}'")
-    print("--------------------------------------------------")
-    error_counter = 0
-    success_counter = 0
-    processed_tracks = 0
-    for idx, favTrack in enumerate(favTracks, 1):
-        track_name, artist_name, track_id = favTrack
-        processed_tracks += 1
+    playlist_title = resume["title"] if resume else f"Favorite songs from Spotify ({date.today().strftime('%d/%m/%Y')})"
+    started = time.perf_counter()
+    file_directory = get_mismatch_directory(None)
+    journal = TransferJournal(None)
+    total = len(favTracks) if isinstance(favTracks, list) else num_songs
+    if resume:
+        yt_playlist_id = resume["yt_playlist_id"]
+        favTracks = (favTrack for favTrack in favTracks if track_key(favTrack) not in resume["done"])
+        total = total - len(resume["done"]) if total is not None else None
+        print(f"\nResuming transfer to playlist '{playlist_title}': {len(resume['done'])} songs already done, {total} left.")
+    else:
         try:
-            search_query = f"{track_name} {artist_name}"
-            search_results = yt.search(search_query, filter="songs", limit=10, ignore_spelling=True)
-            if not search_results:
-                raise ValueError("No search results found")
-            better_result = find_best_match(favTrack, search_results)
-            if not better_result or 'videoId' not in better_result:
-                raise ValueError("No valid match found in search results")
-            video_title = better_result.get('title', 'Unknown')
-            video_artist = ', '.join([a['name'] for a in better_result.get('artists', [])])
-            print(f"[{idx}/{len(favTracks)}] Adding: {video_title} - {video_artist}")
-            yt.add_playlist_items(yt_playlist_id, [better_result['videoId']])
-            success_counter += 1
+            yt_playlist_id = create_yt_playlist(playlist_title, "Automatic transfer from Spotify")
         except Exception as e:
-            error_counter += 1
-            error_msg = f"Error processing '{track_name} - {artist_name}': {str(e)}"
-            print(f"[{idx}/{len(favTracks)}] ERROR: {error_msg}")
-            with open(file_directory, "a", encoding="utf-8") as f:
-                if error_counter == 1:
-                    f.write("=== Favorite songs transfer errors ===\n")
-                f.write(f"{error_msg}\n")
+            print(f"\nError creating playlist: {e}")
+            return
+        print(f"\nStarting transfer of {total} songs to playlist: '{playlist_title}'")
+    print("--------------------------------------------------")
+    journal.open(playlist_title, yt_playlist_id, run_id, resume=resume is not None)
+    processed_tracks = 0
+    output = TransferOutput(yt_playlist_id, file_directory, playlist_title, "=== Favorite songs transfer errors ===", journal, resume["errors"] if resume else 0,
+                            line_format="Error processing '{name} - {artist}': {error}", message_format="ERROR: {line}")
+    with output:  # Also when reading the liked songs fails midway, the songs already matched are still added
+        for idx, (favTrack, better_result, error) in enumerate(resolve_songs(favTracks, resolved=resolved), 1):
+            processed_tracks += 1
+            if error:
+                output.error(favTrack, error)
+                continue
+            video_title = better_result.title or 'Unknown'
+            video_artist = ', '.join(better_result.artists)
+            print(f"[{idx}/{total}] Adding: {video_title} - {video_artist}")
+            output.add(favTrack, better_result.video_id)
+    journal.finish()
+    get_run_stats().add_transfer(playlist_title, matched=len(output.matched), added=output.inserter.added, errors=output.errors,
+                                 insert_requests=output.inserter.requests, seconds=round(time.perf_counter() - started, 3))
+    error_counter = output.errors
     print("\nTransfer summary:")
     print(f"- Total tracks processed: {processed_tracks}")
-    print(f"- Successfully added: {success_counter}")
+    print(f"- Successfully added: {output.inserter.added}")
     print(f"- Errors encountered: {error_counter}")
     if error_counter > 0:
         print(f"\nCheck '{file_directory}' for details on errors")
-    winsound.Beep(freq, tempo)
+    beep()
     return 
 
-def check_and_delete_YTplaylists(name_or_pattern, is_pattern=True):
+class TransferOutput:
+    # Where the songs of a transfer end up: matched ones are added to the YTmusic playlist in batches, the others go to
+    # the mismatch files, and every step is written to the journal (if any). Closing it, also when the transfer stops
+    # with an error, adds the buffered songs and closes the files. Used by transferPlaylist, syncPlaylist and copyFavSongs_toYT_playlist.
+    def __init__(self, yt_playlist_id, file_directory, playlist_name, header, journal=None, errors=0,
+                 line_format="{name} - {artist}: {error}", message_format="Error while adding: {line}"):
+        self.journal = journal
+        self.errors = errors  # Including the ones of the interrupted run, when resuming
+        self.matched = {}  # videoId -> song
+        self.line_format = line_format
+        self.message_format = message_format
+        self._lock = threading.Lock()
+        self.mismatch_log = MismatchLog(file_directory, playlist_name, header if errors == 0 else None)
+        self.inserter = PlaylistInserter(yt_playlist_id, on_error=lambda video_id, e: self.error(self.matched[video_id], e, video_id),
+                                         on_added=self._added if journal else None)
+
+    def add(self, song, video_id):
+        self.matched[video_id] = song
+        if self.journal:
+            self.journal.record(song, video_id, "matched")
+        self.inserter.add(video_id)
+
+    def error(self, song, e, video_id=None):
+        # video_id is the song YTmusic refused to add, None if no song was found
+        line = self.line_format.format(name=song.name, artist=song.artist, error=e)
+        self.mismatch_log.write(line, song, e, video_id)
+        with self._lock:
+            print(self.message_format.format(line=line))
+            self.errors += 1
+        if self.journal:
+            self.journal.record(song, video_id, "failed" if video_id else "mismatch")
+
+    def _added(self, video_ids):
+        self.journal.record_added([(self.matched[video_id], video_id) for video_id in video_ids])
+
+    def close(self):
+        self.inserter.close()
+        self.mismatch_log.close()
+        if self.journal:
+            self.journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PlaylistInserter:
+    # Buffers matched videoIds and adds them to a YTmusic playlist in batches
+    def __init__(self, playlist_id, batch_size=None, flush_interval=None, on_error=None, on_added=None):
+        self.playlist_id = playlist_id
+        self.batch_size = batch_size or BATCH_SIZE
+        self.flush_interval = FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.on_error = on_error  # Called with (videoId, exception) for every song that couldn't be added
+        self.on_added = on_added  # Called with the list of videoIds of every batch that was added
+        self.requests = 0
+        self.added = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, video_id):
+        with self._lock:
+            self._buffer.append(video_id)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+            elif self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._buffer = self._buffer, []
+        if batch:
+            self._insert(batch)
+
+    def _insert(self, video_ids):
+        # A rejected batch is split in half and retried, so a single bad videoId doesn't lose the whole batch.
+        # A batch that failed because YTmusic is down (already retried by RateLimitedClient) fails as a whole instead.
+        try:
+            self.requests += 1
+            with get_run_stats().stage("insert"):
+                response = yt.add_playlist_items(self.playlist_id, video_ids)
+            if isinstance(response, dict) and "SUCCEEDED" not in response.get("status", "SUCCEEDED"):
+                raise ValueError(f"Playlist insertion rejected ({response.get('status')})")
+        except Exception as e:
+            if len(video_ids) == 1 or is_retryable(e):
+                if self.on_error:
+                    for video_id in video_ids:
+                        self.on_error(video_id, e)
+                return
+            half = len(video_ids) // 2
+            self._insert(video_ids[:half])
+            self._insert(video_ids[half:])
+            return
+        self.added += len(video_ids)
+        if self.on_added:
+            self.on_added(video_ids)
+
+def get_journal_path(playlist_name):
+    clean_name = "favSongs" if playlist_name is None else re.sub(r'\W+', '_', playlist_name.lower())
+    journal_dir = os.path.join(CONFIG_DIR, "journals")
+    if not os.path.exists(journal_dir):
+        os.makedirs(journal_dir)
+    return os.path.join(journal_dir, f"journal_{clean_name}.jsonl")
+
+class TransferJournal:
+    # Append-only log of every song of a transfer, used to resume it if the program stops before the end.
+    # Song status is "matched" (waiting to be added), "added", "mismatch" (not found) or "failed" (rejected by YTmusic).
+    def __init__(self, playlist_name):
+        self.path = get_journal_path(playlist_name)
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        state = {"title": None, "yt_playlist_id": None, "run_id": None, "done": set(), "video_ids": {}, "errors": 0, "finished": False}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # The last line may have been cut short by a crash
+                if record["type"] == "start":
+                    state.update(title=record["title"], yt_playlist_id=record["yt_playlist_id"], run_id=record["run_id"])
+                elif record["type"] == "song" and record["status"] != "matched":
+                    state["done"].add(record["key"])
+                    state["errors"] += record["status"] != "added"
+                    if record["status"] == "added":
+                        state["video_ids"][record["key"]] = record["videoId"]
+                elif record["type"] == "end":
+                    state["finished"] = True
+        return state if state["yt_playlist_id"] else None
+
+    def open(self, title, yt_playlist_id, run_id=None, resume=False):
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if not resume:
+            self._write({"type": "start", "title": title, "yt_playlist_id": yt_playlist_id, "run_id": run_id or str(time.time())})
+            self.checkpoint()
+
+    def record(self, song, video_id, status):
+        self._write({"type": "song", "key": track_key(song), "name": song.name, "artist": song.artist, "videoId": video_id, "status": status})
+
+    def record_added(self, songs):
+        for song, video_id in songs:
+            self.record(song, video_id, "added")
+        self.checkpoint()
+
+    def checkpoint(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        # Without an end record, so the transfer can still be resumed
+        if self._file is not None:
+            self.checkpoint()
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        self.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "end"}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+def get_resume_states(playlist_names, resume):
+    # Looks for an interrupted transfer of playlist_names and asks whether to resume it (no question if resume is True).
+    # Returns the run ID to use and the journal state of every playlist belonging to the resumed transfer.
+    states = {name: TransferJournal(name).load() for name in playlist_names}
+    unfinished = [state for state in states.values() if state and not state["finished"]]
+    if not unfinished:
+        return str(time.time()), {}
+    run_id = max(state["run_id"] for state in unfinished)
+    if not resume:
+        done = sum(len(state["done"]) for state in states.values() if state and state["run_id"] == run_id)
+        if not ask_yes_no(f"An interrupted transfer was found ({done} songs already done). Do you wish to resume it?"):
+            return str(time.time()), {}
+    return run_id, {name: state for name, state in states.items() if state and state["run_id"] == run_id}
+
+def pending_songs(songs, state):
+    # Songs of a playlist that a resumed transfer still has to process
+    if not state:
+        return songs
+    if state["finished"]:
+        return []
+    return [song for song in songs if track_key(song) not in state["done"]]
+
+def get_yt_library():
+    # Title -> IDs of the YTmusic library playlists, listed once per session and kept up to date by
+    # create_yt_playlist and delete_yt_playlists (titles aren't unique, so every title has a list)
+    global yt_library
+    if yt_library is None:
+        library = {}
+        for playlist in yt.get_library_playlists(limit=None):
+            if playlist.get('playlistId'):
+                library.setdefault(playlist['title'], []).append(playlist['playlistId'])
+        yt_library = library
+    return yt_library
+
+def create_yt_playlist(title, description):
+    playlist_id = yt.create_playlist(title, description)
+    if yt_library is not None:
+        yt_library.setdefault(title, []).append(playlist_id)
+    return playlist_id
+
+def delete_yt_playlists(playlists):
+    # Deletes the (title, playlist ID) pairs in parallel, returns the number of playlists deleted
+    deleted = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(playlists))), thread_name_prefix="delete") as executor:
+        futures = {executor.submit(yt.delete_playlist, playlist_id): (title, playlist_id) for title, playlist_id in playlists}
+        for future in as_completed(futures):
+            title, playlist_id = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error deleting playlist '{title}': {e}")
+                continue
+            deleted += 1
+            ids = yt_library.get(title, []) if yt_library is not None else []
+            if playlist_id in ids:
+                ids.remove(playlist_id)
+                if not ids:
+                    del yt_library[title]
+    return deleted
+
+def check_and_delete_YTplaylists(name_or_pattern=None, is_pattern=True, names=()):
+    # Looks for the playlists matching name_or_pattern or named like one of names, and deletes the ones
+    # the user chooses with a single confirmation
     global yt
-    matching_playlists = []
+    if name_or_pattern is None and not names:
+        return
     try:
-        YTplaylists = yt.get_library_playlists(limit=None)
+        library = get_yt_library()
     except Exception as e:
         print(f"Error retrieving playlists from YTmusic: {e}")
         return
-    for playlist in YTplaylists:
-        if (is_pattern and re.match(name_or_pattern, playlist['title'])) or (not is_pattern and playlist['title'] == name_or_pattern):
-            matching_playlists.append(playlist)
+    names = set(names)
+    if name_or_pattern is not None and not is_pattern:
+        names.add(name_or_pattern)
+    pattern = re.compile(name_or_pattern) if name_or_pattern is not None and is_pattern else None
+    matching_playlists = [(title, playlist_id) for title, ids in library.items() if title in names or (pattern and pattern.match(title))
+                          for playlist_id in ids]
     if len(matching_playlists) == 1:
-        playlist_name = matching_playlists[0]['title']
-        choice = input(f"Playlist '{playlist_name}' found. Do you wish to delete it? (y/n) ")
-        while choice.strip().lower() not in ['y', 'n']:
-            choice = input("Unrecognized input. ")
-        if choice.strip().lower() == 'y':
-            try:
-                yt.delete_playlist(matching_playlists[0]['playlistId'])
-                print(f"Playlist '{playlist_name}' successfully deleted.")
-            except Exception as e:
-                print(f"Error deleting playlist: {e}")
+        playlist_name = matching_playlists[0][0]
+        if ask_yes_no(f"Playlist '{playlist_name}' found. Do you wish to delete it?") and delete_yt_playlists(matching_playlists):
+            print(f"Playlist '{playlist_name}' successfully deleted.")
     elif len(matching_playlists) > 1:
         print("Multiple matching playlists found:")
-        for i, playlist in enumerate(matching_playlists):
-            print(f"{i+1}. {playlist['title']}")
-        choice = input("Do you wish to delete one or more of them? (y/y to all/n) ")
-        while choice.strip().lower() not in ['y', 'y to all', 'n']:
-            choice = input("Unrecognized input. ")
-        if choice.strip().lower() == 'y to all':
-            for playlist in matching_playlists:
-                try:
-                    yt.delete_playlist(playlist['playlistId'])
-                    print(f"Playlist '{playlist['title']}' deleted.")
-                except Exception as e:
-                    print(f"Error deleting playlist '{playlist['title']}': {e}")
+        for i, (title, playlist_id) in enumerate(matching_playlists):
+            print(f"{i+1}. {title}")
+        if ASSUME_YES:
+            choice = 'y to all'
+            print("Deleting all of them (--yes).")
+        else:
+            try:
+                choice = input("Do you wish to delete one or more of them? (y/y to all/n) ")
+                while choice.strip().lower() not in ['y', 'y to all', 'n']:
+                    choice = input("Unrecognized input. ")
+            except EOFError:
+                choice = 'n'
+        choice = choice.strip().lower()
+        if choice == 'y':
+            matching_playlists = [playlist for playlist in matching_playlists if ask_yes_no(f"Delete '{playlist[0]}'?")]
+        if choice != 'n' and matching_playlists:
+            print(f"{delete_yt_playlists(matching_playlists)} of {len(matching_playlists)} playlists deleted.")
 
 def erase_YTliked_songs(liked_songs):# QUESTA FUNZIONE NON VIENE USATA E SEMBRA NON FUNZIONARE
     global yt
@@ -327,7 +1063,7 @@ def merge_liked_songs_onYT(favTracks, liked_songs):# QUESTA FUNZIONE NON VIENE U
     error_counter = 0
     added_counter = 0
     for favTrack in favTracks:
-        track_name, artist_name, track_id = favTrack
+        track_name, artist_name = favTrack.name, favTrack.artist
         try:
             search_query = f"{track_name} {artist_name}"
             search_results = yt.search(search_query, filter="songs", limit=5, ignore_spelling=True)
@@ -346,35 +1082,478 @@ def merge_liked_songs_onYT(favTracks, liked_songs):# QUESTA FUNZIONE NON VIENE U
                     f.write("Favorite songs not added automatically:\n")
                 f.write(f"{track_name} - {artist_name}, {e}\n")
             error_counter += 1
-    winsound.Beep(freq, tempo)
+    beep()
     print(f"Merge completed: {added_counter} songs added. ({error_counter} errors)")
 
+class MatchCache:
+    # SQLite table mapping Spotify track IDs to the YTmusic song chosen for them (or to the reason no song was found)
+    def __init__(self, path, ttl=None, miss_ttl=None, max_entries=None):
+        self.ttl = MATCH_CACHE_TTL if ttl is None else ttl
+        self.miss_ttl = MISS_CACHE_TTL if miss_ttl is None else miss_ttl
+        self.max_entries = max_entries or MATCH_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)  # Waits for the other tenants' processes when shared
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS matches (
+            track_id TEXT PRIMARY KEY, video_id TEXT, title TEXT, artists TEXT,
+            score REAL, error TEXT, matched_at REAL, last_used REAL, isrc TEXT, candidates TEXT)""")
+        columns = [column[1] for column in self._conn.execute("PRAGMA table_info(matches)")]
+        if "isrc" not in columns:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN isrc TEXT")  # Caches saved before ISRCs were used
+        if "candidates" not in columns:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN candidates TEXT")  # Caches saved before misses kept their candidates
+        self._conn.execute("CREATE INDEX IF NOT EXISTS matches_last_used ON matches (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS matches_isrc ON matches (isrc)")
+        self._conn.commit()
+
+    def get(self, track_id):
+        return self._get("track_id = ?", track_id)
+
+    def get_by_isrc(self, isrc):
+        # Only songs that were found are shared between tracks with the same ISRC
+        return self._get("isrc = ? AND video_id IS NOT NULL ORDER BY matched_at DESC", isrc)
+
+    def _get(self, condition, value):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT track_id, video_id, title, artists, score, error, matched_at, candidates FROM matches WHERE {condition}", (value,)).fetchone()
+            if row is None or now - row[6] > (self.ttl if row[1] else self.miss_ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE matches SET last_used = ? WHERE track_id = ?", (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+        track_id, video_id, title, artists, score, error, matched_at, candidates = row
+        return {"track_id": track_id, "videoId": video_id, "title": title, "artists": json.loads(artists or "[]"), "score": score, "error": error,
+                "candidates": [(MatchCandidate.from_result(result), score) for result, score in json.loads(candidates or "[]")]}
+
+    def put(self, track_id, candidate, score, isrc=None):
+        self._write(track_id, candidate.video_id, candidate.title, json.dumps(list(candidate.artists)), score, None, isrc)
+
+    def put_miss(self, track_id, error):
+        # The best candidates of a MatchError are kept, so the mismatch records of the cached miss still list them
+        candidates = json.dumps([(candidate.to_result(), score) for candidate, score in getattr(error, "candidates", ())], ensure_ascii=False)
+        self._write(track_id, None, None, None, None, str(error), None, candidates)
+
+    def _write(self, track_id, video_id, title, artists, score, error, isrc, candidates=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO matches (track_id, video_id, title, artists, score, error, matched_at, last_used, isrc, candidates) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (track_id, video_id, title, artists, score, error, now, now, isrc, candidates))
+            self._conn.commit()
+
+    def invalidate(self, track_id=None):
+        # Forgets the match of one track, or of every track when track_id is None
+        with self._lock:
+            if track_id is None:
+                self._conn.execute("DELETE FROM matches")
+            else:
+                self._conn.execute("DELETE FROM matches WHERE track_id = ?", (track_id,))
+            self._conn.commit()
+
+    def evict(self):
+        with self._lock:
+            now = time.time()
+            self._conn.execute("DELETE FROM matches WHERE (video_id IS NOT NULL AND matched_at < ?) OR (video_id IS NULL AND matched_at < ?)", (now - self.ttl, now - self.miss_ttl))
+            excess = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute("DELETE FROM matches WHERE track_id IN (SELECT track_id FROM matches ORDER BY last_used LIMIT ?)", (excess,))
+            self._conn.commit()
+
+    def close(self):
+        self.evict()
+        self._conn.close()
+
+def get_match_cache():
+    global match_cache
+    with match_cache_lock:  # Worker threads may ask for the cache at the same time
+        if match_cache is None:
+            ensure_config_dir()
+            match_cache = MatchCache(os.path.join(CONFIG_DIR, MATCH_CACHE_FILE))
+    return match_cache
+
+def clear_match_cache():
+    get_match_cache().invalidate()
+    get_search_cache().invalidate()
+    print("Saved song matches and searches have been cleared, every song will be searched again on the next transfer.")
+
+class SearchCache:
+    # YTmusic search results keyed by normalized query and filter, kept in an LRU dict and in a SQLite table
+    def __init__(self, path, ttl=None, memory_entries=None, max_entries=None):
+        self.ttl = SEARCH_CACHE_TTL if ttl is None else ttl
+        self.memory_entries = memory_entries or SEARCH_CACHE_MEMORY
+        self.max_entries = max_entries or SEARCH_CACHE_SIZE
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)  # Waits for the other tenants' processes when shared
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS searches (
+            query TEXT, filter TEXT, result_limit INTEGER, results TEXT, searched_at REAL,
+            PRIMARY KEY (query, filter))""")
+        self._conn.commit()
+
+    def get(self, query, filter, limit):
+        key = (normalize_query(query), filter)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute("SELECT result_limit, results, searched_at FROM searches WHERE query = ? AND filter = ?", key).fetchone()
+                if row is not None:
+                    entry = (row[0], [MatchCandidate.from_result(result) for result in json.loads(row[1])], row[2])
+                    self._remember(key, entry)
+                    source = "disk"
+            else:
+                self._memory.move_to_end(key)
+                source = "memory"
+            if entry is None or entry[0] < limit or now - entry[2] > self.ttl:
+                self.misses += 1
+                return None
+            if source == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+        return entry[1][:limit]
+
+    def put(self, query, filter, limit, results):
+        key = (normalize_query(query), filter)
+        entry = (limit, results, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            self._conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)", (*key, limit, json.dumps([c.to_result() for c in results]), entry[2]))
+            self._conn.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM searches")
+            self._conn.commit()
+
+    def stats(self):
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM searches WHERE searched_at < ?", (time.time() - self.ttl,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute("DELETE FROM searches WHERE rowid IN (SELECT rowid FROM searches ORDER BY searched_at LIMIT ?)", (excess,))
+            self._conn.commit()
+            self._conn.close()
+
+class MatchError(ValueError):
+    # No search result was good enough, candidates holds the best (MatchCandidate, score) pairs
+    def __init__(self, message, candidates=()):
+        super().__init__(message)
+        self.candidates = candidates
+
+class MatchCandidate:
+    # YTmusic search result reduced to what the matcher uses (thumbnails and the rest of the response are dropped)
+    __slots__ = ("video_id", "title", "artists", "duration_seconds")
+
+    def __init__(self, video_id, title, artists, duration_seconds=None):
+        self.video_id = video_id
+        self.title = title
+        self.artists = artists  # Tuple of interned names, shared by every result of the same artist
+        self.duration_seconds = duration_seconds
+
+    @classmethod
+    def from_result(cls, result):
+        artists = tuple(sys.intern(a["name"]) for a in result.get("artists") or [] if a.get("name"))
+        return cls(result.get("videoId"), result.get("title") or "", artists, result.get("duration_seconds"))
+
+    def to_result(self):
+        return {"videoId": self.video_id, "title": self.title, "artists": [{"name": a} for a in self.artists], "duration_seconds": self.duration_seconds}
+
+def get_search_cache():
+    global search_cache
+    with match_cache_lock:
+        if search_cache is None:
+            ensure_config_dir()
+            search_cache = SearchCache(os.path.join(CONFIG_DIR, MATCH_CACHE_FILE))
+    return search_cache
+
+def cached_search(query, filter="songs", limit=10):
+    # yt.search going through the SearchCache, every YTmusic search of the migrator should use this.
+    # Returns a list of MatchCandidate.
+    cache = get_search_cache()
+    results = cache.get(query, filter, limit)
+    if results is None:
+        with get_run_stats().stage("search"):
+            results = [MatchCandidate.from_result(result) for result in yt.search(query, filter=filter, limit=limit, ignore_spelling=True)]
+        cache.put(query, filter, limit, results)
+    return results
+
+def search_and_match(song):
+    # Cheapest first: saved match of the track (or of the same recording), ISRC search, then text search
+    cache = get_match_cache() if song.id else None
+    cached = cache.get(song.id) if cache else None
+    if not cached and cache and song.isrc:
+        cached = cache.get_by_isrc(song.isrc)  # Same recording saved under another Spotify ID (re-release, compilation...)
+    if cached:
+        if not cached["videoId"]:
+            raise MatchError(cached["error"], cached["candidates"])
+        better_result = MatchCandidate(cached["videoId"], cached["title"], tuple(sys.intern(a) for a in cached["artists"]))
+        if cached["track_id"] != song.id:
+            cache.put(song.id, better_result, cached["score"], song.isrc)
+        return better_result
+    try:
+        better_result, score = match_by_isrc(song) or match_by_search(song)
+        if not better_result or not better_result.video_id:
+            raise ValueError("No valid match found in search results")
+    except ValueError as e:
+        if cache:
+            cache.put_miss(song.id, e)
+        raise
+    if cache:
+        cache.put(song.id, better_result, score, song.isrc)
+    return better_result
+
+def match_by_isrc(song):
+    # YTmusic finds most label releases by their ISRC, results are still checked by length and name
+    if not song.isrc:
+        return None
+    gate = get_isrc_gate()
+    if not gate.should_try():
+        return None
+    search_results = [result for result in cached_search(song.isrc, filter="songs", limit=ISRC_RESULTS) if duration_matches(song, result)]
+    try:
+        found = find_best_match_scored(song, search_results) if search_results else None
+    except ValueError:
+        found = None
+    gate.record(found is not None)
+    return found
+
+def match_by_search(song):
+    # The plain "name artist" search first. When its best result is below CONFIDENT_SCORE, the cleaned title and the
+    # same query among videos are searched at the same time, stopping at the first result above CONFIDENT_SCORE.
+    # Returns the best result of all the searches and its score.
+    query = f"{song.name} {song.artist}"
+    found = search_candidates(song, query, "songs")
+    if SEARCH_FALLBACK and not any(score >= CONFIDENT_SCORE for result, score in found):
+        fallbacks = [(f"{normalize_text(song.name)} {normalize_text(song.artist)}", "songs"), (query, "videos")]
+        fallbacks = [(q, f) for q, f in fallbacks if (normalize_query(q), f) != (normalize_query(query), "songs")]
+        # A failed fallback search only loses its own results, the song isn't marked as failed
+        if MAX_WORKERS == 1:  # No extra threads, e.g. while profiling
+            for q, f in fallbacks:
+                try:
+                    found += search_candidates(song, q, f)
+                except Exception:
+                    continue
+                if any(score >= CONFIDENT_SCORE for result, score in found):
+                    break
+        else:
+            futures = [get_fallback_executor().submit(search_candidates, song, q, f) for q, f in fallbacks]
+            for future in as_completed(futures):
+                try:
+                    found += future.result()
+                except Exception:
+                    continue
+                if any(score >= CONFIDENT_SCORE for result, score in found):
+                    for other in futures:
+                        other.cancel()
+                    break
+    if not found:
+        raise ValueError("No search results found")
+    best = max(found, key=lambda pair: pair[1])  # The first search wins ties
+    if best[1] < MATCH_THRESHOLD:
+        raise MatchError(f"No good match found (max similarity was {best[1]:.2f})", sorted(found, key=lambda pair: pair[1], reverse=True)[:MISMATCH_CANDIDATES])
+    return best
+
+def search_candidates(song, query, filter):
+    # (result, score) pairs of a search: the best result, or the best rejected ones when none is good enough
+    search_results = cached_search(query, filter=filter, limit=10)
+    if filter == "videos":
+        search_results = [video_song_title(result) for result in search_results]
+    try:
+        return [best_search_result(song, search_results)] if search_results else []
+    except MatchError as e:
+        return list(e.candidates)
+    except ValueError:
+        return []
+
+def video_song_title(result):
+    # Music videos are often titled "Artist - Title (Official Video)", the artist is removed before comparing titles
+    for artist in result.artists:
+        if result.title and result.title.lower().startswith(f"{artist.lower()} - "):
+            return MatchCandidate(result.video_id, result.title[len(artist) + 3:], result.artists, result.duration_seconds)
+    return result
+
+def get_fallback_executor():
+    global fallback_executor
+    with match_cache_lock:
+        if fallback_executor is None:
+            fallback_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS * 2, thread_name_prefix="fallback_search")  # Two fallbacks per song
+    return fallback_executor
+
+def best_search_result(song, search_results):
+    same_length = [result for result in search_results if duration_matches(song, result)]
+    if same_length and len(same_length) < len(search_results):
+        try:
+            return find_best_match_scored(song, same_length)
+        except ValueError:
+            pass
+    return find_best_match_scored(song, search_results)
+
+def duration_matches(song, result):
+    # True when the lengths differ by less than DURATION_TOLERANCE, or when one of them is unknown
+    if not song.duration_ms or result.duration_seconds is None:
+        return True
+    return abs(song.duration_ms / 1000 - result.duration_seconds) <= DURATION_TOLERANCE
+
+def resolve_songs(songs, workers=None, resolved=None):
+    # Searches songs in parallel and yields (song, result, error) in the same order as songs.
+    # Songs already found by resolve_planned_songs are taken from resolved instead of being searched again.
+    if resolved is not None:
+        for song in songs:
+            yield (song, *resolved[track_key(song)])
+        return
+    workers = workers or MAX_WORKERS
+    def resolve(song):
+        try:
+            return song, search_and_match(song), None
+        except Exception as e:
+            return song, None, e
+    if workers == 1:  # No worker thread, e.g. while profiling with --profile
+        for song in songs:
+            yield resolve(song)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search") as executor:
+        pending = deque()
+        try:
+            for song in songs:
+                pending.append(executor.submit(resolve, song))
+                if len(pending) >= workers * 4:  # Bounded work in flight, enough that a song waiting for its fallback searches doesn't stall the others
+                    yield pending.popleft().result()
+        except Exception:  # Reading songs failed (e.g. a Spotify page), the songs already searched are returned before the error
+            while pending:
+                yield pending.popleft().result()
+            raise
+        while pending:
+            yield pending.popleft().result()
+
+def track_key(song):
+    return song.id or f"{song.name.lower()}|{song.artist.lower()}"  # Local files on Spotify have no ID
+
+def resolve_planned_songs(song_lists):
+    # Searches every song appearing in song_lists only once, even if it's in more than one playlist
+    unique_songs = {}
+    total_songs = 0
+    for songs in song_lists:
+        for song in songs or []:
+            total_songs += 1
+            unique_songs.setdefault(track_key(song), song)
+    saved = total_songs - len(unique_songs)
+    print(f"\n{len(unique_songs)} unique songs to search out of {total_songs} ({saved} searches saved by skipping duplicates).")
+    resolved = {}
+    for idx, (song, better_result, error) in enumerate(resolve_songs(unique_songs.values()), 1):
+        resolved[track_key(song)] = (better_result, error)
+        if idx % 100 == 0 or idx == len(unique_songs):
+            print(f"[{idx}/{len(unique_songs)}] songs searched on YTmusic...")
+    return resolved
+
 def similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
-def find_best_match(song, search_results):
-    # Expecting exactly 3 values per song.
-    track_name, artist_name, track_id = song
-    best_match = None
-    best_score = -1
-    for result in search_results:
-        title = result.get("title", "")
-        artists = [a["name"].lower() for a in result.get("artists", [])]
-        if not title or not artists:
-            continue
+@lru_cache(maxsize=65536)
+def normalize_text(text):
+    # Lowercase without accents, featured artists, "- Remastered"-like suffixes, brackets and punctuation.
+    # The version they named is kept by version_tags. A name that would be left empty is only lightly normalized.
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    normalized = re.sub(r"\s[-–]\s.*\b(remaster(ed)?|version|edit|mix|live|mono|stereo|deluxe|from|soundtrack|acoustic)\b.*$", "", normalized)
+    normalized = re.sub(r"[(\[].*?[)\]]", " ", normalized)
+    normalized = re.sub(r"\s(feat|ft|featuring)\b\.?\s.*$", "", normalized)  # Not at the start: "Ft. Lauderdale", "FT Island"
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", normalized).split())
+    return normalized or normalize_query(text) or text.lower()
+
+@lru_cache(maxsize=65536)
+def version_tags(text):
+    # VERSION_WORDS in the brackets and " - " suffix of a title, e.g. {"live"} for "Bohemian Rhapsody (Live Aid)"
+    text = unicodedata.normalize("NFKD", text.lower())
+    parts = re.findall(r"[(\[](.*?)[)\]]", text)
+    suffix = re.search(r"\s[-–]\s(.*)$", text)
+    if suffix:
+        parts.append(suffix.group(1))
+    return frozenset(word for part in parts for word in re.findall(r"\w+", part) if word in VERSION_WORDS)
+
+def normalize_query(query):
+    # Lighter than normalize_text: only case, accents, punctuation and spacing, so no words of the query are lost
+    query = unicodedata.normalize("NFKD", query.lower())
+    query = "".join(c for c in query if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", query).split())
+
+@lru_cache(maxsize=65536)
+def ngrams(text, n=3):
+    padded = f" {text} "
+    return frozenset(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+def ngram_similarity(a, b):
+    a, b = ngrams(a), ngrams(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def score_candidates_sequence(track_name, artist_name, candidates):
+    # Original scorer: difflib ratio of the raw title plus the best raw artist ratio
+    scores = []
+    for title, artists in candidates:
+        artists = [a.lower() for a in artists]
         if title.lower() == track_name.lower() and artist_name.lower() in artists:
-            return result
-        score = similarity(track_name, title)
-        artist_score = max(similarity(artist_name, a) for a in artists)
-        total = score + artist_score
-        if total > best_score:
-            best_score = total
-            best_match = result
-    if best_match is None:
+            scores.append(2.0)
+        else:
+            scores.append(similarity(track_name, title) + max(similarity(artist_name, a) for a in artists))
+    return scores
+
+def score_candidates_fast(track_name, artist_name, candidates):
+    # Trigram Jaccard similarity of normalized names, the Spotify side is normalized once for every candidate.
+    # Normalized names hide the version, so a result of another version (live, remix...) loses VERSION_PENALTY.
+    track_tags = version_tags(track_name)
+    track_name, artist_name = normalize_text(track_name), normalize_text(artist_name)
+    scores = []
+    for raw_title, artists in candidates:
+        title = normalize_text(raw_title)
+        artists = [normalize_text(a) for a in artists]
+        if title == track_name and artist_name in artists:
+            score = 2.0
+        else:
+            score = ngram_similarity(track_name, title) + max(ngram_similarity(artist_name, a) for a in artists)
+        if version_tags(raw_title) != track_tags:
+            score = max(score - VERSION_PENALTY, 0.0)
+        scores.append(score)
+    return scores
+
+MATCH_ENGINES = {"sequence": score_candidates_sequence, "fast": score_candidates_fast}
+
+def find_best_match(song, search_results):
+    return find_best_match_scored(song, search_results)[0]
+
+def find_best_match_scored(song, search_results):
+    # Expecting a Track and a list of MatchCandidate. Returns the best candidate and its score (0-2).
+    track_name, artist_name = song.name, song.artist
+    results = [result for result in search_results if result.title and result.artists]
+    candidates = [(result.title, result.artists) for result in results]
+    if not results:
         raise ValueError("No search results returned a valid match.")
-    if best_score < 0.5:
-        raise ValueError(f"No good match found (max similarity was {best_score:.2f})")
-    return best_match
+    with get_run_stats().stage("match"):
+        scores = MATCH_ENGINES[MATCH_ENGINE](track_name, artist_name, candidates)
+    best_idx = max(range(len(scores)), key=scores.__getitem__)  # The first result wins ties
+    best_score = scores[best_idx]
+    if best_score < MATCH_THRESHOLD:
+        best = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:MISMATCH_CANDIDATES]
+        raise MatchError(f"No good match found (max similarity was {best_score:.2f})", [(results[i], scores[i]) for i in best])
+    return results[best_idx], best_score
 
 def ensure_mismatch_dir():
     if not os.path.exists(MISMATCH_DIR):
@@ -388,14 +1567,79 @@ def get_mismatch_directory(playlist_name):
     ensure_mismatch_dir()
     return os.path.join(MISMATCH_DIR, f"mismatch_{clean_name}.txt")
 
+class MismatchLog:
+    # Songs that couldn't be transferred: a line in the text mismatch file and a record, with the best search candidates
+    # and their scores, in the JSONL file next to it. Both files are opened at the first song and stay open (buffered)
+    # until the transfer is closed, which also updates the mismatch index.
+    def __init__(self, file_directory, playlist_name, header=None):
+        self.file_directory = file_directory
+        self.playlist_name = playlist_name
+        self.header = header  # Written before the first song
+        self.count = 0
+        self._text = None
+        self._records = None
+        self._lock = threading.Lock()
+
+    def write(self, line, song, error, video_id=None):
+        record = {"time": datetime.now().isoformat(timespec="seconds"), "playlist": self.playlist_name, "track_id": song.id,
+                  "name": song.name, "artist": song.artist, "isrc": song.isrc, "status": "failed" if video_id else "mismatch",
+                  "video_id": video_id, "error": str(error),
+                  "candidates": [{"video_id": candidate.video_id, "title": candidate.title, "artists": list(candidate.artists), "score": round(score, 3)}
+                                 for candidate, score in getattr(error, "candidates", ())]}
+        with self._lock, get_run_stats().stage("mismatch_write"):
+            if self._text is None:
+                ensure_mismatch_dir()
+                self._text = open(self.file_directory, "a", encoding="utf-8")
+                self._records = open(get_mismatch_records_path(self.file_directory), "a", encoding="utf-8")
+                if self.header:
+                    self._text.write(self.header + "\n")
+            self._text.write(line + "\n")
+            self._records.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._text is None:
+                return
+            self._text.close()
+            self._records.close()
+            self._text = self._records = None
+        update_mismatch_index(self.file_directory, self.playlist_name, self.count)
+
+def get_mismatch_records_path(file_directory):
+    return os.path.splitext(file_directory)[0] + ".jsonl"
+
+def load_mismatch_index():
+    path = os.path.join(MISMATCH_DIR, MISMATCH_INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+def update_mismatch_index(file_directory, playlist_name=None, songs=0, cleared=False):
+    # The index maps every mismatch file name to its playlist and number of songs, so files don't have to be read to know them
+    with mismatch_index_lock:
+        ensure_mismatch_dir()
+        index = load_mismatch_index()
+        entry = index.setdefault(os.path.basename(file_directory), {"playlist": playlist_name, "songs": 0})
+        entry["songs"] = 0 if cleared else entry["songs"] + songs
+        entry["playlist"] = playlist_name or entry["playlist"]
+        entry["updated"] = datetime.now().isoformat(timespec="seconds")
+        path = os.path.join(MISMATCH_DIR, MISMATCH_INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
 def checkMismatch(file_directory, open_file):
     if not os.path.exists(file_directory):
         open(file_directory, 'w', encoding="utf-8").close()
         print(f"File '{file_directory}' not found. A new one has been created.")
         return False
-    with open(file_directory, 'r', encoding="utf-8") as f:
-        content = f.read().strip()
-    if not content:
+    entry = load_mismatch_index().get(os.path.basename(file_directory))
+    if not (entry["songs"] if entry else os.path.getsize(file_directory)):  # Files written before the index only have a size
         print(f"File '{file_directory}' is empty.")
         return False
     if open_file:
@@ -405,19 +1649,23 @@ def checkMismatch(file_directory, open_file):
 def clearMismatch(file_directory):
     with open(file_directory, "w", encoding="utf-8") as f:
         f.write("")
+    if os.path.exists(get_mismatch_records_path(file_directory)):
+        open(get_mismatch_records_path(file_directory), "w", encoding="utf-8").close()
+    update_mismatch_index(file_directory, cleared=True)
     print(f"Mismatch file '{file_directory}' has been cleared.")
 
 def open_selected_mismatch_files():
     if not os.path.exists(MISMATCH_DIR):
         print("Mismatch directory not found.")
         return
-    files = [f for f in os.listdir(MISMATCH_DIR) if os.path.isfile(os.path.join(MISMATCH_DIR, f))]
+    index = load_mismatch_index()
+    files = sorted(f for f in os.listdir(MISMATCH_DIR) if f.startswith("mismatch_") and f.endswith(".txt"))
     if not files:
         print("No mismatch files found in the directory.")
         return
     print("Mismatch files found:")
     for i, file_directory in enumerate(files, start=1):
-        print(f"{i}. {file_directory}")
+        print(f"{i}. {file_directory}" + (f" ({index[file_directory]['songs']} songs)" if file_directory in index else ""))
     while True:
         selection = input("Enter the numbers of the files you want to open (separated by spaces) or type 'exit' to cancel: ").strip()
         if selection.lower() == 'exit':
@@ -436,13 +1684,20 @@ def open_selected_mismatch_files():
         file_path = os.path.join(MISMATCH_DIR, files[idx-1])
         os.system(f'notepad "{file_path}"')
 
+def is_valid_selection(selection, playlists):
+    words = selection.lower().split()
+    if words[:1] == ['sync']:
+        return words[1:] == ['all'] or (len(words) > 1 and all(i.isdigit() and 1 <= int(i) <= len(playlists) for i in words[1:]))
+    return selection.lower() in ['exit', 'fav', 'all'] or all(i.isdigit() and 1 <= int(i) <= len(playlists) for i in words)
+
 def askCommands():
     commands = {
         "1": "Transfer from Spotify to YT Music",
         "3": "Open Transfer mismatch list",
         "2": "Transfer from YT Music to Spotify",
         "4": "Uninstall all resources",
-        "5": "Exit                             "}
+        "5": "Exit                             ",
+        "6": "Clear saved song matches"}
     while True:
         print("\nAvailable commands (enter the number):")
         for key, value in commands.items():
@@ -456,34 +1711,175 @@ def askCommands():
         else:
             print("Unrecognized input. Please try again.")
 
-def main():
+def connect_clients():
+    # Both accounts are connected at the same time, so startup waits for the slowest one instead of both
+    connections = [connect for is_connected, connect in ((isSpotifyAPI_connected, connectToSpotifyAPI), (isYTmusicAPI_connected, connectToYTmusicAPI))
+                   if not is_connected()]
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="connect") as executor:
+        futures = [executor.submit(connect) for connect in connections]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"\n{e}\nExiting.")
+            return False
+    return True
+
+def ask_clear_mismatch(file_directory):
+    if checkMismatch(file_directory, False) and ask_yes_no("Transfer mismatch list isn't empty, do you want to erase it?"):
+        clearMismatch(file_directory)
+
+def transfer_favorites(favCount, resume=False):
+    try:
+        run_id, resume_states = get_resume_states([None], resume)
+        if None not in resume_states:
+            check_and_delete_YTplaylists(r"Favorite songs from Spotify \(.*\)", True)
+            ask_clear_mismatch(get_mismatch_directory("favSongs"))
+        if favCount > 500:
+            print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
+        print("\nThis process runs in background, you may minimize this app.")
+        copyFavSongs_toYT_playlist(getSPFavoriteTracks(), resume=resume_states.get(None), run_id=run_id, num_songs=favCount)
+    except Exception as e:
+        print(f"\nFatal error during favorite songs transfer: {e}")
+        return False
+    return True
+
+def transfer_all(playlists, favCount, resume=False):
+    # Favorite songs and every playlist, the songs they have in common are only searched once
+    tot_songs = sum([num for name, num, playlist_id in playlists] + [favCount])
+    try:
+        run_id, resume_states = get_resume_states([None] + [name for name, num, playlist_id in playlists], resume)
+        check_and_delete_YTplaylists(r"Favorite songs from Spotify \(.*\)" if None not in resume_states else None,
+                                     names=[name for name, num, playlist_id in playlists if name not in resume_states])
+        if None not in resume_states:
+            ask_clear_mismatch(get_mismatch_directory("favSongs"))
+        if tot_songs > 500:
+            print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
+        print("\nThis process runs in background, you may minimize this app.")
+        print("Fetching songs from all playlists...")
+        favTracks = list(getSPFavoriteTracks())
+        playlist_songs = [list(get_playlist_tracks("Spotify", playlist_id)) for name, num, playlist_id in playlists]
+        resolved = resolve_planned_songs([pending_songs(favTracks, resume_states.get(None))] +
+                                         [pending_songs(songs, resume_states.get(name)) for (name, num, playlist_id), songs in zip(playlists, playlist_songs)])
+        copyFavSongs_toYT_playlist(favTracks, resolved, resume_states.get(None), run_id)
+    except Exception as e:
+        print(f"\nError while managing favorite songs: \n{e}")
+        return False
+    try:
+        for (playlist_name, num_songs, playlist_id), songs in zip(playlists, playlist_songs):
+            if playlist_name not in resume_states:
+                ask_clear_mismatch(get_mismatch_directory(playlist_name))
+            transferPlaylist(playlist_id, playlist_name, "Spotify", "YTmusic", songs, resolved, resume_states.get(playlist_name), run_id, replace_existing=False)
+    except Exception as e:
+        print(f"\nError while managing playlists: \n{e}")
+        return False
+    return True
+
+def transfer_playlists(selected_playlists, resume=False):
+    tot_songs = sum([num for name, num, playlist_id in selected_playlists])
+    if tot_songs > 500:
+        print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
+    print("\nThis process runs in background, you may minimize this app.")
+    run_id, resume_states = get_resume_states([name for name, num, playlist_id in selected_playlists], resume)
+    check_and_delete_YTplaylists(names=[name for name, num, playlist_id in selected_playlists if name not in resume_states])
+    playlist_songs = [None] * len(selected_playlists)
+    resolved = None
+    if len(selected_playlists) > 1:
+        print("Fetching songs from the selected playlists...")
+        playlist_songs = [list(get_playlist_tracks("Spotify", playlist_id)) for name, num, playlist_id in selected_playlists]
+        resolved = resolve_planned_songs([pending_songs(songs, resume_states.get(name)) for (name, num, playlist_id), songs in zip(selected_playlists, playlist_songs)])
+    for (playlist_name, num_songs, playlist_id), songs in zip(selected_playlists, playlist_songs):
+        if playlist_name not in resume_states:
+            ask_clear_mismatch(get_mismatch_directory(playlist_name))
+        transferPlaylist(playlist_id, playlist_name, "Spotify", "YTmusic", songs, resolved, resume_states.get(playlist_name), run_id, num_songs, replace_existing=False)
+    return True
+
+def sync_playlists(selected_playlists, remove_missing=False):
+    # A playlist that can't be synced doesn't stop the others, returns False if any of them failed
+    completed = True
+    for playlist_name, num_songs, playlist_id in selected_playlists:
+        try:
+            syncPlaylist(playlist_id, playlist_name, remove_missing)
+        except Exception as e:
+            print(f"\nError while syncing '{playlist_name}': \n{e}")
+            completed = False
+    return completed
+
+def close_session():
+    # Saves the caches and the run report, and prints what the session cost in API calls
+    global match_cache, search_cache, run_stats, yt_library, isrc_gate
+    yt_library = None  # Listed again in the next session, the library may have been changed elsewhere
+    if run_stats is not None:
+        report_path = run_stats.save()
+        if report_path:
+            print(f"Run report saved to {report_path}")
+        run_stats = None
+    if isrc_gate is not None:
+        stats = isrc_gate.stats()
+        print(f"ISRC searches: {stats['tried']} tried, {stats['hits']} found the song, {stats['skipped']} skipped because they kept missing")
+        isrc_gate = None
+    if match_cache is not None:
+        match_cache.close()
+        match_cache = None
+    if search_cache is not None:
+        stats = search_cache.stats()
+        print(f"Search cache: {stats['memory_hits']} hits in memory, {stats['disk_hits']} on disk, {stats['misses']} misses")
+        search_cache.close()
+        search_cache = None
+    print_client_stats()
+
+def migrate(playlists=(), fav=False, all_playlists=False, sync=False, remove_missing=False, resume=False):
+    # Transfers without any menu, playlists are selected by name or by their number in the menu list.
+    # Returns False if the transfer couldn't be completed.
+    if not connect_clients():
+        return False
+    available = getPlaylists("Spotify")
+    selected_playlists = list(available) if all_playlists else []
+    for wanted in [] if all_playlists else playlists:
+        wanted = str(wanted)
+        found = [playlist for playlist in available if playlist[0] == wanted]
+        if not found and wanted.isdigit() and 1 <= int(wanted) <= len(available):
+            found = [available[int(wanted) - 1]]
+        if not found:
+            print(f"Playlist '{wanted}' not found on Spotify.")
+            return False
+        selected_playlists += found
+    if not selected_playlists and not fav:
+        print("Nothing to transfer, select some playlists, --all or --fav.")
+        return False
+    if sync:
+        if fav:
+            print("Favorite songs can't be synced, only the selected playlists will be.")
+        return sync_playlists(selected_playlists, remove_missing)
+    favCount = getSPFavoriteCount() if fav else 0
+    if fav and all_playlists:
+        return transfer_all(selected_playlists, favCount, resume)
+    if fav and not transfer_favorites(favCount, resume):
+        return False
+    if selected_playlists:
+        return transfer_playlists(selected_playlists, resume)
+    return True
+
+def main(resume=False):
     while True:
         command = askCommands()
         if command == "5":
             break
         elif command == "4":
             UninstallAll()
+        elif command == "6":
+            clear_match_cache()
         elif command == "3":
             open_selected_mismatch_files()
         elif command == "1":
             transferFrom = "Spotify" 
             transferTo = "YTmusic"           
-            if not isSpotifyAPI_connected():
-                try:
-                    connectToSpotifyAPI()
-                except Exception as e:
-                    print(f"\n{e}\nExiting.")
-                    return False
-            if not isYTmusicAPI_connected():
-                try:
-                    connectToYTmusicAPI()
-                except Exception as e:
-                    print(f"\n{e}\nExiting.")
-                    return False
+            if not connect_clients():
+                return False
             print("Fetching User informations, please wait...")
             playlists = getPlaylists(transferFrom)
-            favTracks = getSPFavoriteTracks() 
-            if not playlists and not favTracks:
+            favCount = getSPFavoriteCount()  # Liked songs are only downloaded if they're selected
+            if not playlists and not favCount:
                 print("No playlists nor favorite songs found.\n Exiting.")
                 return None
             if playlists: 
@@ -492,67 +1888,36 @@ def main():
                     print(f"({idx}) {name} - {num} songs")
             else:
                 print("No playlists found.")
-            if favTracks:
-                print(f"Favorite songs: {len(favTracks)}\nMind that, if you wish to transfer your favorite songs from Spotify to YTmusic, this program will save them in a new playlist.")
+            if favCount:
+                print(f"Favorite songs: {favCount}\nMind that, if you wish to transfer your favorite songs from Spotify to YTmusic, this program will save them in a new playlist.")
             else:
                 print("No Favorite songs found.")
             selected_playlists = []
-            selection = input("Enter playlist(s) number(s) separated by spaces, or type 'Fav' for liked songs, 'all' or 'exit': ").strip()
-            while selection.lower() not in ['exit', 'fav', 'all'] and not all(i.isdigit() and 1 <= int(i) <= len(playlists) for i in selection.split()):
-                selection = input("Unrecognized input, please enter playlist(s) number(s) separated by spaces, 'Fav', 'all' or 'exit': ").strip()
+            selection = input("Enter playlist(s) number(s) separated by spaces, or type 'Fav' for liked songs, 'all' or 'exit'.\n"
+                              "Type 'sync' before the numbers or 'all' to only add the songs missing from playlists already on YTmusic: ").strip()
+            while not is_valid_selection(selection, playlists):
+                selection = input("Unrecognized input, please enter playlist(s) number(s) separated by spaces, 'Fav', 'all', 'sync ...' or 'exit': ").strip()
             
             if selection.lower() == "exit":
                 break
 
+            elif selection.lower().startswith("sync"):
+                selection = selection[4:].strip()
+                selected_playlists = playlists if selection.lower() == 'all' else [playlists[int(i) - 1] for i in selection.split()]
+                remove_missing = ask_yes_no("Do you also want to remove from YTmusic the songs removed from Spotify?")
+                sync_playlists(selected_playlists, remove_missing)
+
             elif selection.lower() == 'fav':
-                try:
-                    check_and_delete_YTplaylists(r"Favorite songs from Spotify \(.*\)", True)
-                    file_directory = get_mismatch_directory("favSongs")
-                    if checkMismatch(file_directory, False) and input("Transfer mismatch list isn't empty, do you want to erase it? (y/n) ").strip().lower() == 'y': 
-                        clearMismatch(file_directory)
-                    if len(favTracks) > 500: 
-                        print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
-                    print("\nThis process runs in background, you may minimize this app.")
-                    copyFavSongs_toYT_playlist(favTracks)
-                except Exception as e:
-                    print(f"\nFatal error during favorite songs transfer: {e}")
+                if not transfer_favorites(favCount, resume):
                     return None
                 
             elif selection.lower() == 'all':
-                tot_songs = sum([num for name, num, playlist_id in playlists] + [len(favTracks)])
-                try:
-                    check_and_delete_YTplaylists(r"Favorite songs from Spotify \(.*\)", True)
-                    file_directory = get_mismatch_directory("favSongs")
-                    if checkMismatch(file_directory, False) and input("Transfer mismatch list isn't empty, do you want to erase it? (y/n) ").strip().lower() == 'y': 
-                        clearMismatch(file_directory)
-                    if tot_songs > 500:
-                        print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
-                    print("\nThis process runs in background, you may minimize this app.")
-                    copyFavSongs_toYT_playlist(favTracks)
-                except Exception as e:
-                    print(f"\nError while managing favorite songs: \n{e}")
-                    return None
-                try:
-                    selected_playlists = playlists
-                    for playlist_name, num_songs, playlist_id in selected_playlists:
-                        if checkMismatch(get_mismatch_directory(playlist_name), False) and input("Transfer mismatch list isn't empty, do you want to erase it? (y/n) ").strip().lower() == 'y': 
-                            clearMismatch(get_mismatch_directory(playlist_name))
-                        transferPlaylist(playlist_id, playlist_name, transferFrom, transferTo)
-                except Exception as e:
-                    print(f"\nError while managing playlists: \n{e}")
+                if not transfer_all(playlists, favCount, resume):
                     return None
                 
             elif all(i.isdigit() and 1 <= int(i) <= len(playlists) for i in selection.split()):
                 selected_playlists = [playlists[int(i) - 1] for i in selection.split()]
-                tot_songs = 0
-                tot_songs = sum([num for name, num, playlist_id in selected_playlists])
-                if tot_songs > 500:
-                    print("\nThis may take a while, you can enter Ctrl+C to abort and shutdown...")
-                print("\nThis process runs in background, you may minimize this app.")
-                for playlist_name, num_songs, playlist_id in selected_playlists:
-                    if checkMismatch(get_mismatch_directory(playlist_name), False) and input("Transfer mismatch list isn't empty, do you want to erase it? (y/n) ").strip().lower() == 'y': 
-                        clearMismatch(get_mismatch_directory(playlist_name))
-                    transferPlaylist(playlist_id, playlist_name, transferFrom, transferTo)
+                transfer_playlists(selected_playlists, resume)
 
         elif command == "2":
             transferFrom = "YTmusic" 
@@ -562,8 +1927,243 @@ def main():
     print("Program terminated.")
     return True
 
-#if __name__ == "__musicTransfer_main__":
-main()
+def run_profiled(path, function, *args, **kwargs):
+    # Runs function under cProfile and saves the profile to path (read it with pstats or snakeviz).
+    # cProfile only sees the calling thread, so songs are searched one at a time.
+    global MAX_WORKERS
+    if not path:
+        return function(*args, **kwargs)
+    MAX_WORKERS = 1
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+        print(f"Profile saved to {path}")
+
+def get_tenant_dir(tenant):
+    # Folder with the credentials (oauth.json, spotify_auth.json, ...), settings.json, journals and mismatch files of a tenant
+    if not re.fullmatch(r"[\w.-]+", tenant) or tenant.strip(".") == "":
+        raise ValueError(f"Invalid tenant name '{tenant}', use only letters, numbers, '.', '-' and '_'.")
+    tenant_dir = os.path.join(TENANTS_DIR, tenant)
+    if not os.path.exists(tenant_dir):
+        os.makedirs(tenant_dir)
+    return tenant_dir
+
+class JobQueue:
+    # SQLite queue of the migrations run by the scheduler, one process per job.
+    # Jobs left running by a scheduler that was stopped are queued again (and resumed) when it restarts.
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, tenant TEXT, args TEXT, status TEXT, attempts INTEGER,
+            created REAL, started REAL, finished REAL, exit_code INTEGER, not_before REAL)""")
+        if "not_before" not in [column[1] for column in self._conn.execute("PRAGMA table_info(jobs)")]:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")  # Queues created before failed jobs waited to be retried
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    def add(self, tenant, args):
+        cursor = self._conn.execute("INSERT INTO jobs (tenant, args, status, attempts, created) VALUES (?, ?, 'queued', 0, ?)",
+                                    (tenant, json.dumps(args), time.time()))
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def recover(self):
+        cursor = self._conn.execute("UPDATE jobs SET status = 'queued', not_before = NULL WHERE status = 'running'")
+        self._conn.commit()
+        return cursor.rowcount
+
+    def queued(self):
+        # Every queued job with the time it can start at (0 if it can start now)
+        rows = self._conn.execute("SELECT id, tenant, args, not_before FROM jobs WHERE status = 'queued' ORDER BY id").fetchall()
+        return [(job_id, tenant, json.loads(args), not_before or 0) for job_id, tenant, args, not_before in rows]
+
+    def start(self, job_id):
+        self._conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ? WHERE id = ?", (time.time(), job_id))
+        self._conn.commit()
+
+    def finish(self, job_id, exit_code, max_attempts=None, backoff=None):
+        # Failed jobs are queued again, after backoff seconds doubled at every attempt, until they have been
+        # tried max_attempts times. Returns the new status and the time the job can start again at.
+        max_attempts = max_attempts or JOB_ATTEMPTS
+        backoff = JOB_BACKOFF if backoff is None else backoff
+        attempts = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        status = "done" if exit_code == 0 else "queued" if attempts < max_attempts else "failed"
+        now = time.time()
+        not_before = now + backoff * 2 ** (attempts - 1) if status == "queued" else None
+        self._conn.execute("UPDATE jobs SET status = ?, finished = ?, exit_code = ?, not_before = ? WHERE id = ?",
+                           (status, now, exit_code, not_before, job_id))
+        self._conn.commit()
+        return status, not_before
+
+    def jobs(self):
+        return self._conn.execute("SELECT id, tenant, args, status, attempts, exit_code FROM jobs ORDER BY id").fetchall()
+
+    def close(self):
+        self._conn.close()
+
+def build_job_command(tenant, args, workers):
+    # The migration runs in its own process so every tenant gets its own clients, credentials and rate limits.
+    # Interrupted jobs are always resumed from their journal, the match cache is shared by all tenants.
+    return [sys.executable, os.path.abspath(__file__), "--config-dir", get_tenant_dir(tenant),
+            "--match-cache", os.path.join(TENANTS_DIR, MATCH_CACHE_FILE),
+            "migrate", *args, "--resume", "--concurrency", str(workers)]
+
+def run_scheduler(queue, max_tenants=None, total_workers=None, job_command=None, poll_interval=1):
+    # Runs the queued jobs until the queue is empty, at most one per tenant and max_tenants at a time.
+    # total_workers is split evenly between the running tenants, and the tenant that waited the longest goes first
+    # so one with many jobs doesn't hold back the others. Returns the number of jobs that failed.
+    max_tenants = max_tenants or SCHEDULER_TENANTS
+    total_workers = total_workers or SCHEDULER_WORKERS
+    job_command = job_command or build_job_command
+    recovered = queue.recover()
+    if recovered:
+        print(f"{recovered} interrupted jobs queued again, they will be resumed.")
+    running = {}  # Tenant -> (job ID, process, log file)
+    last_started = {}  # Tenant -> time its last job was started
+    failed = 0
+    try:
+        while True:
+            for tenant, (job_id, process, log) in list(running.items()):
+                if process.poll() is None:
+                    continue
+                log.close()
+                del running[tenant]
+                status, not_before = queue.finish(job_id, process.returncode)
+                failed += status == "failed"
+                outcome = "finished" if status == "done" else f"failed, retried in {not_before - time.time():.0f}s" if status == "queued" else "failed"
+                print(f"Job {job_id} of '{tenant}' {outcome} (exit code {process.returncode}), see job_{job_id}.log")
+            waiting = OrderedDict()
+            first_jobs = set()
+            queued = queue.queued()
+            now = time.time()
+            for job_id, tenant, args, not_before in queued:
+                if tenant in first_jobs:  # The jobs of a tenant run in order, a later one doesn't overtake a job waiting to be retried
+                    continue
+                first_jobs.add(tenant)
+                if tenant not in running and not_before <= now:
+                    waiting[tenant] = (job_id, args)
+            if not running and not queued:
+                return failed
+            if not waiting:
+                time.sleep(poll_interval)
+                continue
+            workers = max(1, total_workers // min(max_tenants, len(running) + len(waiting)))
+            for tenant in sorted(waiting, key=lambda name: last_started.get(name, 0)):
+                if len(running) >= max_tenants:
+                    break
+                job_id, args = waiting[tenant]
+                queue.start(job_id)
+                last_started[tenant] = time.time()
+                tenant_dir = get_tenant_dir(tenant)
+                log = open(os.path.join(tenant_dir, f"job_{job_id}.log"), "a", encoding="utf-8")
+                process = subprocess.Popen(job_command(tenant, args, workers), cwd=tenant_dir, stdin=subprocess.DEVNULL,
+                                           stdout=log, stderr=subprocess.STDOUT)  # Questions get 'n' unless the job has --yes
+                running[tenant] = (job_id, process, log)
+                print(f"Job {job_id} of '{tenant}' started with {workers} workers.")
+            time.sleep(poll_interval)
+    finally:
+        for tenant, (job_id, process, log) in running.items():  # Left 'running', resumed at the next start
+            process.terminate()
+            process.wait()
+            log.close()
+
+def run_schedule_command(args, migrate_parser):
+    # Returns the exit code of the schedule command
+    if not os.path.exists(TENANTS_DIR):
+        os.makedirs(TENANTS_DIR)
+    queue = JobQueue(os.path.join(TENANTS_DIR, SCHEDULER_DB))
+    try:
+        if args.action == "add":
+            job_args = [arg for arg in args.migrate_args if arg != "--"]
+            migrate_parser.parse_args(job_args)  # Wrong options are reported now instead of when the job runs
+            try:
+                tenant_dir = get_tenant_dir(args.tenant)
+            except ValueError as e:
+                print(e)
+                return 2
+            job_id = queue.add(args.tenant, job_args)
+            print(f"Job {job_id} queued for '{args.tenant}', its credentials are read from {tenant_dir}")
+        elif args.action == "list":
+            for job_id, tenant, job_args, status, attempts, exit_code in queue.jobs():
+                print(f"{job_id}\t{tenant}\t{status}\tattempts: {attempts}\texit code: {exit_code}\t{' '.join(json.loads(job_args))}")
+        else:
+            return 1 if run_scheduler(queue, args.tenants, args.workers) else 0
+    finally:
+        queue.close()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Copies Spotify playlists and favorite songs to YouTube Music. Without a command the interactive menu is started.")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted transfer without asking")
+    parser.add_argument("--config", help=f"JSON settings file (default: {SETTINGS_FILE} in the config folder, if it exists)")
+    parser.add_argument("--profile", metavar="FILE", help="save a cProfile of the run to FILE, songs are searched one at a time so every call is "
+                                                          "recorded (to profile concurrent runs use py-spy, threads are named after their stage)")
+    parser.add_argument("--config-dir", help=f"folder with the credentials, tokens and journals (default: {CONFIG_DIR})")
+    parser.add_argument("--match-cache", metavar="FILE", help=f"match and search cache database (default: {MATCH_CACHE_FILE} in the config folder)")
+    subparsers = parser.add_subparsers(dest="command")
+    migrate_parser = subparsers.add_parser("migrate", help="transfer without asking anything, e.g. from a scheduled job")
+    migrate_parser.add_argument("--playlists", nargs="+", default=[], metavar="PLAYLIST", help="Spotify playlists to transfer, by name or number")
+    migrate_parser.add_argument("--all", action="store_true", help="transfer every playlist")
+    migrate_parser.add_argument("--fav", action="store_true", help="transfer favorite songs to a new playlist")
+    migrate_parser.add_argument("--sync", action="store_true", help="only add the songs missing from playlists already on YTmusic")
+    migrate_parser.add_argument("--remove-missing", action="store_true", help="with --sync, also remove the songs removed from Spotify")
+    migrate_parser.add_argument("--resume", action="store_true", default=argparse.SUPPRESS, help="continue an interrupted transfer")
+    migrate_parser.add_argument("--yes", action="store_true", help="answer 'y' to every question (delete old copies, clear mismatch lists, ...)")
+    migrate_parser.add_argument("--concurrency", type=int, help=f"songs searched at the same time (default: {MAX_WORKERS})")
+    migrate_parser.add_argument("--batch-size", type=int, help=f"songs added to a playlist with a single request (default: {BATCH_SIZE})")
+    migrate_parser.add_argument("--config", default=argparse.SUPPRESS, help="JSON settings file")
+    migrate_parser.add_argument("--profile", default=argparse.SUPPRESS, metavar="FILE", help="save a cProfile of the run to FILE")
+    schedule_parser = subparsers.add_parser("schedule", help=f"migrate many account pairs, each with its own folder in {TENANTS_DIR}")
+    actions = schedule_parser.add_subparsers(dest="action", required=True)
+    add_parser = actions.add_parser("add", help="queue a migration for a tenant, e.g. 'schedule add alice -- --all --yes'")
+    add_parser.add_argument("tenant", help="name of the tenant's folder")
+    add_parser.add_argument("migrate_args", nargs=argparse.REMAINDER, help="options of the migrate command")
+    run_parser = actions.add_parser("run", help="run the queued jobs, interrupted ones are resumed")
+    run_parser.add_argument("--tenants", type=int, help=f"tenants migrated at the same time (default: {SCHEDULER_TENANTS})")
+    run_parser.add_argument("--workers", type=int, help=f"songs searched at the same time by all the tenants together (default: {SCHEDULER_WORKERS})")
+    actions.add_parser("list", help="show the jobs and their status")
+    return parser, migrate_parser
+
+def run_cli(argv):
+    # Returns the exit code of the program
+    global ASSUME_YES, MAX_WORKERS, BATCH_SIZE, CONFIG_DIR, MATCH_CACHE_FILE
+    parser, migrate_parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.config_dir:
+        CONFIG_DIR = os.path.abspath(args.config_dir)
+    if args.match_cache:
+        MATCH_CACHE_FILE = os.path.abspath(args.match_cache)
+    try:
+        options = load_settings(args.config)
+    except ValueError as e:
+        print(e)
+        return 2
+    if args.command == "schedule":
+        return run_schedule_command(args, migrate_parser)
+    if args.command != "migrate":
+        try:  # Also when the menu stops after an error, so the report of a failed run is saved too
+            completed = run_profiled(args.profile, main, resume=args.resume or options.get("resume", False))
+        finally:
+            close_session()
+        return 0 if completed else 1
+    migrate_parser.set_defaults(**options)  # Options given on the command line win over the settings file
+    args = parser.parse_args(argv)
+    ASSUME_YES = args.yes
+    if args.concurrency:
+        MAX_WORKERS = args.concurrency
+    if args.batch_size:
+        BATCH_SIZE = args.batch_size
+    try:
+        completed = run_profiled(args.profile, migrate, args.playlists, args.fav, args.all, args.sync, args.remove_missing, args.resume)
+    finally:
+        close_session()
+    return 0 if completed else 1
+
+if __name__ == "__main__":
+    sys.exit(run_cli(sys.argv[1:]))
 #connectToSpotifyAPI() #CHIAMATE DI DEBUG, SERVONO PER PROVARE SOLO LA CONNESSIONE ALLE API
 #connectToYTmusicAPI()
 